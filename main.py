@@ -7,23 +7,28 @@ Modify src/config/settings.py to experiment with different chunking parameters.
 Supported strategies: "recursive", "code", "ast"
 """
 
-from src.config import settings
+import logging
+
+from src.config import settings, setup_logging
 from src.loaders import load_python_files
 from src.chunking import get_chunker
 from src.retrieval import RetrievalPipeline
 from src.agents import create_rag_agent, run_agent
 
+logger = logging.getLogger(__name__)
+
 
 def main():
     """Run the RAG pipeline."""
+    setup_logging()
     
     # 1. Load Python files from data folder
-    print("Loading documents...")
+    logger.info("Loading documents...")
     docs = load_python_files(["data/"])
-    print(f"Loaded {len(docs)} document(s), {len(docs[0].page_content)} characters")
+    logger.info("Loaded %d document(s), %d characters", len(docs), len(docs[0].page_content))
     
     # 2. Initialize retrieval pipeline with chunking strategy
-    print(f"\nUsing chunking strategy: {settings.CHUNKING_STRATEGY}")
+    logger.info("Using chunking strategy: %s", settings.CHUNKING_STRATEGY)
     chunker = get_chunker(
         settings.CHUNKING_STRATEGY,
         chunk_size=settings.CHUNK_SIZE,
@@ -32,11 +37,11 @@ def main():
     pipeline = RetrievalPipeline(chunker=chunker)
     
     # 3. Index documents
-    print("\nIndexing documents...")
+    logger.info("Indexing documents...")
     pipeline.index_documents(docs)
     
     # 4. Create agent with retrieval tool
-    print("\nCreating RAG agent...")
+    logger.info("Creating RAG agent...")
     retrieval_tool = pipeline.create_retrieval_tool()
     agent = create_rag_agent(tools=[retrieval_tool])
     
@@ -45,8 +50,7 @@ def main():
         "What classes and functions are defined in the code?\n\n"
         "Describe the purpose of the Calculator class."
     )
-    print(f"\nQuery: {query}\n")
-    print("-" * 50)
+    logger.info("Query: %s", query)
     run_agent(agent, query)
 
 
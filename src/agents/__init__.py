@@ -1 +1 @@
-from .rag_agent import create_rag_agent, run_agent
+from .rag_agent import arun_agent_batch, create_rag_agent, run_agent, run_agent_batch
@@ -2,16 +2,30 @@
 RAG Agent using LangGraph's create_agent.
 """
 
+import functools
+
 from langchain_groq import ChatGroq
 from langchain.agents import create_agent
+from langchain_core.caches import InMemoryCache
+from langchain_core.globals import set_llm_cache
 
 from src.config import settings
 
+# Identical (prompt, model, temperature) calls are served from memory
+if settings.LLM_CACHE:
+    set_llm_cache(InMemoryCache(maxsize=settings.LLM_CACHE_SIZE))
+
 
 def get_llm(temp: float = settings.LLM_TEMPERATURE) -> ChatGroq:
-    """Initialize the LLM."""
+    """Return the LLM for a temperature, shared by every agent that uses it."""
     if temp is None:
         temp = settings.LLM_TEMPERATURE
+    return _llm(temp)
+
+
+@functools.lru_cache(maxsize=8)
+def _llm(temp: float) -> ChatGroq:
+    # Only deterministic generations are cached; sampled ones must stay fresh
     return ChatGroq(
         model=settings.LLM_MODEL,
         temperature=temp,
@@ -19,6 +33,7 @@ def get_llm(temp: float = settings.LLM_TEMPERATURE) -> ChatGroq:
         reasoning_format="parsed",
         timeout=None,
         max_retries=settings.LLM_MAX_RETRIES,
+        cache=None if temp == 0 else False,
     )
 
 
@@ -67,3 +82,28 @@ def run_agent(agent, query: str, stream: bool = True):
     else:
         result = agent.invoke({"messages": messages})
         return result["messages"][-1].content
+
+
+def run_agent_batch(agent, queries: list[str]) -> list[str]:
+    """
+    Run the agent on several queries concurrently.
+
+    Args:
+        agent: The agent to run
+        queries: User queries; repeat a query to sample it several times
+
+    Returns:
+        The final response to each query, in order
+    """
+    results = agent.batch([
+        {"messages": [{"role": "user", "content": query}]} for query in queries
+    ])
+    return [result["messages"][-1].content for result in results]
+
+
+async def arun_agent_batch(agent, queries: list[str]) -> list[str]:
+    """Async `run_agent_batch`."""
+    results = await agent.abatch([
+        {"messages": [{"role": "user", "content": query}]} for query in queries
+    ])
+    return [result["messages"][-1].content for result in results]
@@ -7,10 +7,14 @@ Run with: uv run uvicorn src.api.main:app --reload
 """
 
 from contextlib import asynccontextmanager
+import json
+import logging
 import zipfile
 
 from fastapi import FastAPI, HTTPException, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from langchain_core.documents import Document
 
 from .models import (
     HealthResponse,
@@ -26,17 +30,25 @@ from .models import (
     UploadResponse,
     SelfCheckRequest,
     SelfCheckResponse,
+    SelfCheckBatchRequest,
+    SelfCheckBatchResponse,
+    CacheStatsResponse,
 )
-from .service import rag_service
-from src.config import settings
+from .routing import FastModelRoute
+from .service import rag_service, ZipTooLargeError
+from src.config import settings, setup_logging
+from src.retrieval import get_shared_embeddings
+
+setup_logging()
+logger = logging.getLogger(__name__)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Startup and shutdown events."""
-    print("RAG API starting up...")
+    logger.info("RAG API starting up...")
     yield
-    print("RAG API shutting down...")
+    logger.info("RAG API shutting down...")
 
 
 app = FastAPI(
@@ -45,6 +57,7 @@ app = FastAPI(
     version="0.1.0",
     lifespan=lifespan,
 )
+app.router.route_class = FastModelRoute
 
 # CORS middleware for frontend access
 app.add_middleware(
@@ -88,7 +101,10 @@ async def update_config(request: ConfigUpdateRequest):
             settings.RETRIEVAL_MODE = "vector"
         elif strategy == "graph":
             settings.RETRIEVAL_MODE = "graph"
+        rag_service.clear_agent_cache()
     if request.retrieval_k is not None:
+        if request.retrieval_k != settings.RETRIEVAL_K:
+            rag_service.clear_retrieval_cache()
         settings.RETRIEVAL_K = request.retrieval_k
     
     return ConfigResponse(
@@ -97,10 +113,24 @@ async def update_config(request: ConfigUpdateRequest):
     )
 
 
+@app.get("/cache/stats", response_model=CacheStatsResponse, tags=["Configuration"])
+async def cache_stats():
+    """Get hit/miss statistics for the shared embedding cache."""
+    if get_shared_embeddings.cache_info().currsize == 0:
+        # Nothing has embedded yet; don't load the model just to report zeros
+        return CacheStatsResponse(embedding_hits=0, embedding_misses=0, embedding_hit_rate=0.0)
+    stats = get_shared_embeddings().stats()
+    return CacheStatsResponse(
+        embedding_hits=stats["hits"],
+        embedding_misses=stats["misses"],
+        embedding_hit_rate=stats["hit_rate"],
+    )
+
+
 @app.get("/databases", response_model=DatabasesResponse, tags=["Databases"])
 async def list_databases():
     """List available ChromaDB collections."""
-    collections = rag_service.list_collections()
+    collections = await rag_service.list_collections()
     return DatabasesResponse(
         databases=collections,
         count=len(collections),
@@ -111,7 +141,7 @@ async def list_databases():
 async def index_files(request: IndexRequest):
     """Index Python files from the data/ directory."""
     try:
-        num_docs, num_chunks = rag_service.index_files(
+        num_docs, num_chunks = await rag_service.index_files(
             file_paths=request.file_paths,
             strategy=request.strategy,
         )
@@ -136,7 +166,7 @@ async def index_files(request: IndexRequest):
 async def query(request: QueryRequest):
     """Query the indexed codebase using the RAG agent."""
     try:
-        answer, retrieved_docs = rag_service.query_with_agent(
+        answer, retrieved_docs = await rag_service.query_with_agent(
             query=request.query,
             strategy=request.strategy,
             k=request.k,
@@ -144,16 +174,7 @@ async def query(request: QueryRequest):
         )
         
         # Convert retrieved docs to ChunkInfo
-        chunks = []
-        for doc in retrieved_docs:
-            chunks.append(ChunkInfo(
-                content=doc.page_content,
-                source=doc.metadata.get("source", ""),
-                chunk_type=doc.metadata.get("chunk_type"),
-                start_line=doc.metadata.get("start_line"),
-                end_line=doc.metadata.get("end_line"),
-                name=doc.metadata.get("name"),
-            ))
+        chunks = [_to_chunk_info(doc) for doc in retrieved_docs]
         
         return QueryResponse(
             answer=answer,
@@ -165,6 +186,45 @@ async def query(request: QueryRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/query/stream", tags=["Query"])
+async def query_stream(request: QueryRequest):
+    """
+    Stream the RAG agent's answer as Server-Sent Events.
+    
+    Emits `{"token": ...}` events as the answer is generated, then a final
+    `{"retrieved_chunks": [...], "num_chunks": ...}` event.
+    """
+    async def event_gen():
+        try:
+            async for kind, payload in rag_service.aquery_with_agent(
+                query=request.query,
+                strategy=request.strategy,
+                k=request.k,
+                collection=request.collection,
+            ):
+                if kind == "token":
+                    yield f"data: {json.dumps({'token': payload})}\n\n"
+                else:
+                    chunks = [_to_chunk_info(doc).model_dump() for doc in payload]
+                    yield f"data: {json.dumps({'retrieved_chunks': chunks, 'num_chunks': len(chunks)})}\n\n"
+        except Exception as e:
+            yield f"data: {json.dumps({'error': str(e)})}\n\n"
+
+    return StreamingResponse(event_gen(), media_type="text/event-stream")
+
+
+def _to_chunk_info(doc: Document) -> ChunkInfo:
+    """Convert a retrieved Document to its API representation."""
+    return ChunkInfo(
+        content=doc.page_content,
+        source=doc.metadata.get("source", ""),
+        chunk_type=doc.metadata.get("chunk_type"),
+        start_line=doc.metadata.get("start_line"),
+        end_line=doc.metadata.get("end_line"),
+        name=doc.metadata.get("name"),
+    )
+
+
 @app.post("/index/upload", response_model=UploadResponse, tags=["Indexing"])
 async def upload_zip(file: UploadFile = File(...)):
     """
@@ -177,7 +237,7 @@ async def upload_zip(file: UploadFile = File(...)):
         raise HTTPException(status_code=400, detail="Only .zip files are accepted")
     
     try:
-        num_docs, num_chunks, collection = rag_service.index_from_zip(
+        num_docs, num_chunks, collection = await rag_service.index_from_zip(
             zip_file=file.file,
             zip_name=file.filename,
             strategy=ChunkingStrategy(settings.CHUNKING_STRATEGY),
@@ -196,6 +256,8 @@ async def upload_zip(file: UploadFile = File(...)):
         )
     except zipfile.BadZipFile:
         raise HTTPException(status_code=400, detail="Invalid or corrupted zip file")
+    except ZipTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -209,7 +271,7 @@ async def self_check(request: SelfCheckRequest):
     then compares embeddings to detect potential hallucinations.
     """
     try:
-        similarity, is_hallucinating = rag_service.check_hallucination(
+        similarity, is_hallucinating = await rag_service.check_hallucination(
             query=request.query,
             response=request.response,
             collection=request.collection,
@@ -222,3 +284,29 @@ async def self_check(request: SelfCheckRequest):
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/selfcheck/batch", response_model=SelfCheckBatchResponse, tags=["Query"])
+async def self_check_batch(request: SelfCheckBatchRequest):
+    """
+    Check many responses against one collection using SelfCheckGPT.
+    
+    Repeated pairs and queries are checked once, samples for all queries
+    are generated concurrently and all responses are embedded together.
+    """
+    try:
+        results = await rag_service.check_hallucinations(
+            pairs=[(pair.query, pair.response) for pair in request.pairs],
+            collection=request.collection,
+            k=request.k,
+        )
+        
+        return SelfCheckBatchResponse(results=[
+            SelfCheckResponse(
+                is_hallucinating=is_hallucinating,
+                similarity_score=similarity,
+            )
+            for similarity, is_hallucinating in results
+        ])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
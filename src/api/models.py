@@ -163,3 +163,32 @@ class SelfCheckResponse(BaseModel):
     is_hallucinating: bool = Field(..., description="True if hallucination detected")
     similarity_score: float = Field(..., description="Cosine similarity between responses (0-1)")
 
+
+class SelfCheckPair(BaseModel):
+    """One (query, response) pair in a batched self-check."""
+    query: str = Field(..., description="The original user query")
+    response: str = Field(..., description="The response to check for hallucinations")
+
+
+class SelfCheckBatchRequest(BaseModel):
+    """Request model for checking many responses against one collection."""
+    pairs: list[SelfCheckPair] = Field(..., min_length=1, description="Query/response pairs to check")
+    collection: str = Field(..., description="ChromaDB collection name to use for generating the sampled responses")
+    k: int = Field(
+        default=3,
+        ge=1,
+        le=10,
+        description="Number of documents to retrieve for each sampled response"
+    )
+
+
+class SelfCheckBatchResponse(BaseModel):
+    """Response model for a batched self-check, one result per pair."""
+    results: list[SelfCheckResponse] = Field(..., description="Check results, in request order")
+
+
+class CacheStatsResponse(BaseModel):
+    """Response model for embedding cache statistics."""
+    embedding_hits: int = Field(..., description="Chunk embeddings served from cache")
+    embedding_misses: int = Field(..., description="Chunk embeddings computed by the model")
+    embedding_hit_rate: float = Field(..., description="Fraction of chunk embeddings served from cache (0-1)")
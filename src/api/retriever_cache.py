@@ -0,0 +1,63 @@
+"""LRU cache for retrieval results keyed by (query, collection, k, model)."""
+
+from collections import OrderedDict
+import hashlib
+import pickle
+import threading
+import zlib
+
+from langchain_core.documents import Document
+
+from src.config import settings
+
+
+class RetrieverCache:
+    """
+    Bounded LRU cache of ``pipeline.search`` results.
+
+    Results are stored as compressed pickles, which keeps memory small and
+    hands every caller its own copy of the documents.
+
+    Args:
+        max_entries: Maximum number of cached searches before the least
+            recently used one is evicted.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[str, bytes]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(query: str, collection: str, k: int) -> str:
+        raw = pickle.dumps((query, collection, k, settings.EMBEDDING_MODEL))
+        return hashlib.sha256(raw).hexdigest()
+
+    def get(self, query: str, collection: str, k: int) -> list[Document] | None:
+        """Return cached documents for the search, or None on a miss."""
+        key = self._key(query, collection, k)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+        return pickle.loads(zlib.decompress(entry[1]))
+
+    def put(self, query: str, collection: str, k: int, docs: list[Document]) -> None:
+        """Store the documents returned by a search."""
+        key = self._key(query, collection, k)
+        value = zlib.compress(pickle.dumps(docs))
+        with self._lock:
+            self._entries[key] = (collection, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self, collection: str | None = None) -> None:
+        """Drop cached searches for one collection, or all if None."""
+        with self._lock:
+            if collection is None:
+                self._entries.clear()
+                return
+            for key in [k for k, (c, _) in self._entries.items() if c == collection]:
+                del self._entries[key]
@@ -0,0 +1,58 @@
+"""Custom FastAPI routing that validates JSON bodies in a single pass."""
+
+import json
+from collections.abc import Callable
+from typing import Any, Coroutine
+
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+from pydantic import BaseModel, ValidationError
+
+
+class _ModelRequest(Request):
+    """Request whose JSON body is parsed straight into a Pydantic model."""
+
+    body_model: type[BaseModel]
+
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            body = await self.body()
+            try:
+                # pydantic-core parses and validates the raw bytes in one pass
+                self._json = self.body_model.model_validate_json(body)
+            except ValidationError:
+                # Fall back to plain JSON so FastAPI reports its usual 422 errors
+                self._json = json.loads(body)
+        return self._json
+
+
+class FastModelRoute(APIRoute):
+    """
+    APIRoute that skips the intermediate ``json.loads`` + dict validation.
+
+    For endpoints with a single Pydantic model body, the raw request bytes
+    are handed to ``Model.model_validate_json``. FastAPI then receives a
+    model instance, which it accepts without re-validating.
+    """
+
+    def _json_body_model(self) -> type[BaseModel] | None:
+        params = self.dependant.body_params
+        if len(params) != 1 or getattr(params[0].field_info, "embed", False):
+            return None
+        annotation = params[0].field_info.annotation
+        if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+            return annotation
+        return None
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        original_route_handler = super().get_route_handler()
+        body_model = self._json_body_model()
+        if body_model is None:
+            return original_route_handler
+
+        async def custom_route_handler(request: Request) -> Response:
+            request = _ModelRequest(request.scope, request.receive)
+            request.body_model = body_model
+            return await original_route_handler(request)
+
+        return custom_route_handler
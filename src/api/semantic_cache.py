@@ -0,0 +1,80 @@
+"""Semantic cache for RAG answers keyed by query embedding similarity."""
+
+from collections import OrderedDict
+from collections.abc import Hashable
+from typing import Any
+
+import numpy as np
+
+
+class SemanticCache:
+    """
+    In-memory cache that returns a stored value for near-duplicate queries.
+
+    Lookups are two-tier: an exact match on the query text is a plain dict
+    hit and needs no embedding; otherwise the query embedding is compared
+    against every stored vector in the scope.
+
+    Entries are grouped by scope (e.g. collection, k, temperature) so answers
+    generated under one configuration are never served for another.
+
+    Args:
+        similarity_threshold: Minimum cosine similarity for a cache hit.
+        max_entries: Maximum entries kept per scope; oldest are evicted first.
+    """
+
+    def __init__(self, similarity_threshold: float = 0.95, max_entries: int = 1024):
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self._vectors: dict[Hashable, np.ndarray] = {}
+        self._values: dict[Hashable, list[Any]] = {}
+        self._exact: OrderedDict[tuple[Hashable, str], Any] = OrderedDict()
+
+    @staticmethod
+    def _normalize(embedding: list[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup_exact(self, scope: Hashable, query: str) -> Any | None:
+        """Return the value cached for exactly this query text, or None."""
+        value = self._exact.get((scope, query))
+        if value is not None:
+            self._exact.move_to_end((scope, query))
+        return value
+
+    def lookup(self, scope: Hashable, embedding: list[float]) -> Any | None:
+        """Return the cached value closest to `embedding`, or None on a miss."""
+        vectors = self._vectors.get(scope)
+        if vectors is None:
+            return None
+
+        similarities = vectors @ self._normalize(embedding)
+        best = int(np.argmax(similarities))
+        if similarities[best] >= self.similarity_threshold:
+            return self._values[scope][best]
+        return None
+
+    def update(
+        self, scope: Hashable, embedding: list[float], value: Any, query: str | None = None
+    ) -> None:
+        """Store `value` under `embedding` (and `query`, if given) within `scope`."""
+        if query is not None:
+            self._exact[(scope, query)] = value
+            while len(self._exact) > self.max_entries:
+                self._exact.popitem(last=False)
+
+        vector = self._normalize(embedding)[np.newaxis, :]
+        if scope not in self._vectors:
+            self._vectors[scope] = vector
+            self._values[scope] = [value]
+            return
+
+        self._vectors[scope] = np.vstack([self._vectors[scope], vector])[-self.max_entries:]
+        self._values[scope] = (self._values[scope] + [value])[-self.max_entries:]
+
+    def clear(self) -> None:
+        """Drop all cached entries."""
+        self._vectors.clear()
+        self._values.clear()
+        self._exact.clear()
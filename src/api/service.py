@@ -2,50 +2,108 @@
 RAG Pipeline Service - manages pipelines for different chunking strategies.
 """
 
+import asyncio
+from collections import deque
+from collections.abc import AsyncIterator, Awaitable, Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import functools
+import hashlib
+import time
 from pathlib import Path
-import tempfile
 import zipfile
 from typing import Any
 
 from langchain_core.documents import Document
+from langchain_core.messages import AIMessageChunk, ToolMessage
 
 from src.api.utils import load_system_prompt
 from src.config import settings
-from src.loaders import load_python_files
-from src.chunking import get_chunker
-from src.retrieval import RetrievalPipeline
+from src.loaders import aload_python_files, content_hash
+from src.chunking import BaseChunker, get_chunker
+from src.retrieval import RetrievalPipeline, build_collection_name
 from src.agents import create_rag_agent
 
 from .models import ChunkingStrategy
+from .retriever_cache import RetrieverCache
+from .semantic_cache import SemanticCache
+
+
+# Seconds a /databases listing is reused before AstraDB is queried again
+COLLECTIONS_TTL = 2.0
+
+# Directories whose files are never indexed from an uploaded archive.
+# Hidden directories (".git", ".venv", ...) are skipped separately.
+SKIP_DIRS = frozenset({"__pycache__", "node_modules", "venv", "site-packages", "dist", "build"})
+
+
+@dataclass(frozen=True, slots=True)
+class PipelineKey:
+    """Identifies the pipeline built for a strategy over one source directory."""
+
+    source_dir: str | None
+    strategy: str
+
+
+@functools.cache
+def _get_chunker(strategy: str) -> BaseChunker:
+    """Return the shared chunker for a strategy; chunkers hold no per-pipeline state."""
+    return get_chunker(
+        strategy,
+        chunk_size=settings.CHUNK_SIZE,
+        chunk_overlap=settings.CHUNK_OVERLAP,
+    )
 
 
 class RAGService:
     """Service class that manages RAG pipelines for different strategies."""
 
     def __init__(self):
-        self.pipelines: dict[str, RetrievalPipeline] = {}
-        self.indexed_files: dict[str, list[str]] = {}
+        self.pipelines: dict[PipelineKey, RetrievalPipeline] = {}
+        self.collection_pipelines: dict[str, RetrievalPipeline] = {}
+        self.indexed_files: dict[PipelineKey, list[str]] = {}
+        self._locks: dict[PipelineKey, asyncio.Lock] = {}
+        self._keylock = asyncio.Lock()
+        self.query_cache = SemanticCache(
+            similarity_threshold=settings.SEMANTIC_CACHE_THRESHOLD
+        )
+        self.retrieval_cache = RetrieverCache()
+        self._agents: dict[tuple[str, int, float, str], Any] = {}
+        self._query_executor = ThreadPoolExecutor(
+            max_workers=settings.QUERY_WORKERS, thread_name_prefix="rag-query"
+        )
+        self._coll_cache: tuple[float, list[str]] = (float("-inf"), [])
+        self._coll_lock = asyncio.Lock()
 
-    def get_or_create_pipeline(
+    async def get_or_create_pipeline(
         self, strategy: ChunkingStrategy, source_dir: str | None = None
     ) -> RetrievalPipeline:
-        """Get existing pipeline or create a new one."""
-        key = f"{source_dir}_{strategy.value}" if source_dir else strategy.value
-
-        if key not in self.pipelines:
-            chunker = get_chunker(
-                strategy.value,
-                chunk_size=settings.CHUNK_SIZE,
-                chunk_overlap=settings.CHUNK_OVERLAP,
-            )
-            self.pipelines[key] = RetrievalPipeline(
-                chunker=chunker, source_dir=source_dir
-            )
-            self.indexed_files[key] = []
+        """Get existing pipeline or create a new one.
+
+        Concurrent callers for the same key wait on a per-key lock so the
+        expensive pipeline construction (embedding model load, vector store
+        client) only happens once.
+        """
+        key = PipelineKey(source_dir or None, strategy.value)
+
+        if key in self.pipelines:
+            return self.pipelines[key]
+
+        async with self._keylock:
+            lock = self._locks.setdefault(key, asyncio.Lock())
+
+        async with lock:
+            if key not in self.pipelines:
+                chunker = _get_chunker(strategy.value)
+                # Construction blocks on model loading; keep the event loop free
+                self.pipelines[key] = await asyncio.to_thread(
+                    RetrievalPipeline, chunker=chunker, source_dir=source_dir
+                )
+                self.indexed_files[key] = []
 
         return self.pipelines[key]
 
-    def index_files(
+    async def index_files(
         self, file_paths: list[str], strategy: ChunkingStrategy, base_path: str = "data"
     ) -> tuple[int, int]:
         """Index files using the specified strategy."""
@@ -55,21 +113,219 @@ class RAGService:
             if first_path.parts:
                 source_dir = first_path.parts[0]
 
-        pipeline = self.get_or_create_pipeline(strategy, source_dir)
-        key = f"{source_dir}_{strategy.value}" if source_dir else strategy.value
+        pipeline = await self.get_or_create_pipeline(strategy, source_dir)
+        key = PipelineKey(source_dir, strategy.value)
 
         full_paths = [str(Path(base_path) / fp) for fp in file_paths]
-        docs = load_python_files(full_paths)
+        num_docs, num_chunks = await self._index_paths(pipeline, full_paths)
 
-        if not docs:
+        if not num_docs:
             return 0, 0
 
-        doc_ids = pipeline.index_documents(docs)
         self.indexed_files[key].extend(file_paths)
+        self.clear_retrieval_cache()
+        self.invalidate_collections()
+
+        return num_docs, num_chunks
+
+    async def _index_paths(
+        self, pipeline: RetrievalPipeline, paths: list[str]
+    ) -> tuple[int, int]:
+        """Load, chunk and index files from disk as overlapping stages."""
+        return await self._run_index_stages(
+            pipeline, functools.partial(self._load_stage, paths)
+        )
+
+    async def _run_index_stages(
+        self,
+        pipeline: RetrievalPipeline,
+        load_stage: Callable[[asyncio.Queue], Awaitable[int]],
+    ) -> tuple[int, int]:
+        """
+        Run the load, chunk and embed/upsert stages concurrently.
+
+        While file N is being embedded and upserted, file N+1 is chunked and
+        file N+2 is read. Stages are connected by bounded queues; ``None``
+        marks the end of a stream.
+
+        Args:
+            pipeline: Pipeline whose chunker and vector store are used
+            load_stage: Coroutine function that puts Documents on the queue
+                it is given, then ``None``, and returns the document count
+
+        Returns:
+            Tuple of (num_documents, num_chunks)
+        """
+        docs_queue: asyncio.Queue[Document | None] = asyncio.Queue(maxsize=8)
+        chunks_queue: asyncio.Queue[list[Document] | None] = asyncio.Queue(maxsize=8)
+
+        stages = [
+            asyncio.create_task(load_stage(docs_queue)),
+            asyncio.create_task(self._chunk_stage(pipeline, docs_queue, chunks_queue)),
+            asyncio.create_task(self._embed_upsert_stage(pipeline, chunks_queue)),
+        ]
+        try:
+            num_docs, _, num_chunks = await asyncio.gather(*stages)
+        except BaseException:
+            for stage in stages:
+                stage.cancel()
+            raise
+
+        return num_docs, num_chunks
+
+    @staticmethod
+    async def _index_docs_with_ray(
+        pipeline: RetrievalPipeline, docs: list[Document]
+    ) -> tuple[int, int]:
+        """
+        Index documents with embeddings computed across Ray workers.
+
+        The vectors are written into the pipeline's embedding cache, so the
+        regular upsert below is served entirely from cache hits.
+
+        Returns:
+            Tuple of (num_documents, num_chunks)
+        """
+        from src.retrieval.ray_embeddings import embed_with_ray
+
+        changed = await pipeline.afilter_unindexed(docs)
+        chunks = await asyncio.to_thread(pipeline.chunk, changed)
+        if not chunks:
+            return len(docs), 0
+
+        texts = [chunk.page_content for chunk in chunks]
+        vectors = await asyncio.to_thread(embed_with_ray, texts)
+        await asyncio.to_thread(pipeline.embeddings.prime, texts, vectors)
+
+        num_chunks = 0
+        for i in range(0, len(chunks), settings.EMBED_BATCH_SIZE):
+            batch = chunks[i:i + settings.EMBED_BATCH_SIZE]
+            num_chunks += len(await pipeline.aindex_chunks(batch))
+        await pipeline.amark_indexed(chunks)
+        return len(docs), num_chunks
+
+    @staticmethod
+    async def _load_stage(paths: list[str], out: asyncio.Queue) -> int:
+        """Read files from disk concurrently and emit one Document at a time."""
+        docs = await aload_python_files(paths)
+        for doc in docs:
+            await out.put(doc)
+        await out.put(None)
+        return len(docs)
+
+    @staticmethod
+    async def _zip_stage(
+        zf: zipfile.ZipFile, entries: list[zipfile.ZipInfo], out: asyncio.Queue
+    ) -> int:
+        """
+        Read zip entries on a thread pool and emit Documents in archive order.
+
+        ZipFile serialises only the raw reads of its underlying file;
+        decompression runs outside that lock and zlib releases the GIL, so
+        several entries inflate in parallel from one handle.
+        """
+        loop = asyncio.get_running_loop()
+        workers = settings.ZIP_READ_WORKERS
+        pending: deque[asyncio.Future[Document]] = deque()
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="zip-read") as pool:
+            try:
+                for info in entries:
+                    pending.append(loop.run_in_executor(pool, _read_zip_entry, zf, info))
+                    # Bound the read-ahead so memory stays flat on huge archives
+                    if len(pending) >= workers * 2:
+                        await out.put(await pending.popleft())
+                while pending:
+                    await out.put(await pending.popleft())
+            finally:
+                for future in pending:
+                    future.cancel()
+
+        await out.put(None)
+        return len(entries)
+
+    @staticmethod
+    async def _chunk_stage(
+        pipeline: RetrievalPipeline, inp: asyncio.Queue, out: asyncio.Queue
+    ) -> None:
+        """
+        Split incoming Documents, skipping files already indexed unchanged.
+        
+        Documents are taken in groups of ``settings.INDEX_CHECK_BATCH_SIZE``
+        (at least ``settings.CHUNK_PROCESS_MIN_DOCS``), so each group needs a
+        single "already indexed?" lookup and its changed files are big enough
+        to be parsed on the chunking process pool.
+        """
+        group_size = max(settings.INDEX_CHECK_BATCH_SIZE, settings.CHUNK_PROCESS_MIN_DOCS)
+        done = False
+        while not done:
+            group: list[Document] = []
+            while len(group) < group_size:
+                if (doc := await inp.get()) is None:
+                    done = True
+                    break
+                group.append(doc)
+            changed = await pipeline.afilter_unindexed(group)
+            chunks = await asyncio.to_thread(pipeline.chunk, changed)
+            if chunks:
+                await out.put(chunks)
+        await out.put(None)
+
+    @staticmethod
+    async def _embed_upsert_stage(pipeline: RetrievalPipeline, inp: asyncio.Queue) -> int:
+        """
+        Embed and upsert incoming chunks in micro-batches.
+
+        Chunks are regrouped into batches of ``settings.EMBED_BATCH_SIZE`` and
+        up to ``settings.EMBED_CONCURRENCY`` batches are in flight at once.
+        Each incoming group of chunks is marked indexed once every batch
+        holding one of them has been upserted.
+        """
+        size = settings.EMBED_BATCH_SIZE
+        semaphore = asyncio.Semaphore(settings.EMBED_CONCURRENCY)
+
+        async def embed_batch(batch: list[Document]) -> int:
+            async with semaphore:
+                return len(await pipeline.aindex_chunks(batch))
 
-        return len(docs), len(doc_ids)
+        async def mark(chunks: list[Document], batches: list[asyncio.Task[int]]) -> None:
+            await asyncio.gather(*batches)
+            await pipeline.amark_indexed(chunks)
 
-    def query_with_agent(
+        tasks: list[asyncio.Task[int]] = []
+        marks: list[asyncio.Task[None]] = []
+        # Incoming groups not yet marked, with the batch range their chunks span
+        unmarked: deque[tuple[list[Document], int, int]] = deque()
+        buffer: list[Document] = []
+        queued = 0
+
+        def schedule_marks() -> None:
+            while unmarked and unmarked[0][2] < len(tasks):
+                chunks, first, last = unmarked.popleft()
+                marks.append(asyncio.create_task(mark(chunks, tasks[first:last + 1])))
+
+        try:
+            while (chunks := await inp.get()) is not None:
+                unmarked.append((chunks, queued // size, (queued + len(chunks) - 1) // size))
+                queued += len(chunks)
+                buffer.extend(chunks)
+                while len(buffer) >= size:
+                    batch, buffer = buffer[:size], buffer[size:]
+                    tasks.append(asyncio.create_task(embed_batch(batch)))
+                schedule_marks()
+            if buffer:
+                tasks.append(asyncio.create_task(embed_batch(buffer)))
+            schedule_marks()
+
+            num_chunks = sum(await asyncio.gather(*tasks))
+            await asyncio.gather(*marks)
+            return num_chunks
+        except BaseException:
+            for task in tasks + marks:
+                task.cancel()
+            raise
+
+    async def query_with_agent(
         self,
         query: str,
         strategy: ChunkingStrategy,
@@ -85,40 +341,153 @@ class RAGService:
             k: Number of documents to retrieve
             collection: Optional ChromaDB collection name to query directly
         """
-        if collection:
-            # Query a specific collection directly
-            pipeline = self._get_pipeline_for_collection(collection)
-        else:
-            pipeline = self.get_or_create_pipeline(strategy)
+        pipeline = await self._resolve_pipeline(strategy, collection)
 
-        # Temporarily set k
-        original_k = settings.RETRIEVAL_K
-        settings.RETRIEVAL_K = k
+        # Repeated and near-duplicate questions skip retrieval and generation
+        cache_scope = (collection or strategy.value, k, temp)
+        cached = self.query_cache.lookup_exact(cache_scope, query)
+        if cached is not None:
+            return cached
+        query_embedding = await self._run_blocking(pipeline.embeddings.embed_query, query)
+        cached = self.query_cache.lookup(cache_scope, query_embedding)
+        if cached is not None:
+            return cached
 
         # initiating and running agents
-        retrieval_tool = pipeline.create_retrieval_tool()
-
-        system_prompt = load_system_prompt("./system_prompt")
-        agent = create_rag_agent(
-            tools=[retrieval_tool], system_prompt=system_prompt, temp=temp
-        )
+        agent = self._get_agent(pipeline, cache_scope[0], k, temp)
 
         messages = [{"role": "user", "content": query}]
-        result = agent.invoke({"messages": messages})
-
-        # Restore original k because every time we change it, it is changed globally
-        settings.RETRIEVAL_K = original_k
+        # The LLM call blocks for seconds; run it off the event loop
+        result = await self._run_blocking(agent.invoke, {"messages": messages})
 
-        # Extract answer and get retrieved docs
+        # Extract answer and the docs the agent's retrieval tool returned
         answer = result["messages"][-1].content
-        retrieved_docs = pipeline.search(query, k=k)
+        retrieved_docs = _tool_documents(result["messages"])
+        if retrieved_docs is None:
+            retrieved_docs = await self._run_blocking(
+                self._retrieve_docs, pipeline, query, cache_scope[0], k
+            )
 
+        self.query_cache.update(cache_scope, query_embedding, (answer, retrieved_docs), query)
         return answer, retrieved_docs
 
+    async def aquery_with_agent(
+        self,
+        query: str,
+        strategy: ChunkingStrategy,
+        k: int = 3,
+        temp: int = settings.LLM_TEMPERATURE,
+        collection: str | None = None
+    ) -> AsyncIterator[tuple[str, Any]]:
+        """Stream the RAG agent's answer as it is generated.
+        
+        Takes the same arguments as `query_with_agent`.
+        
+        Yields:
+            ("token", str) for each piece of answer text, followed by a single
+            ("chunks", list[Document]) with the retrieved context.
+        """
+        pipeline = await self._resolve_pipeline(strategy, collection)
+
+        cache_scope = (collection or strategy.value, k, temp)
+        cached = self.query_cache.lookup_exact(cache_scope, query)
+        if cached is None:
+            query_embedding = await self._run_blocking(pipeline.embeddings.embed_query, query)
+            cached = self.query_cache.lookup(cache_scope, query_embedding)
+        if cached is not None:
+            answer, retrieved_docs = cached
+            yield "token", answer
+            yield "chunks", retrieved_docs
+            return
+
+        agent = self._get_agent(pipeline, cache_scope[0], k, temp)
+
+        messages = [{"role": "user", "content": query}]
+        tokens = []
+        tool_messages = []
+        async for chunk, _ in agent.astream({"messages": messages}, stream_mode="messages"):
+            # Only model output is streamed; tool results stay internal
+            if isinstance(chunk, AIMessageChunk) and isinstance(chunk.content, str) and chunk.content:
+                tokens.append(chunk.content)
+                yield "token", chunk.content
+            elif isinstance(chunk, ToolMessage):
+                tool_messages.append(chunk)
+
+        retrieved_docs = _tool_documents(tool_messages)
+        if retrieved_docs is None:
+            retrieved_docs = await self._run_blocking(
+                self._retrieve_docs, pipeline, query, cache_scope[0], k
+            )
+        self.query_cache.update(cache_scope, query_embedding, ("".join(tokens), retrieved_docs), query)
+        yield "chunks", retrieved_docs
+
+    async def _run_blocking(self, fn: Callable, *args) -> Any:
+        """Run a blocking call on the query thread pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._query_executor, fn, *args)
+
+    async def _resolve_pipeline(
+        self, strategy: ChunkingStrategy, collection: str | None
+    ) -> RetrievalPipeline:
+        """Pick the pipeline for a collection if given, else for the strategy."""
+        if collection:
+            # Query a specific collection directly
+            return self._get_pipeline_for_collection(collection)
+        return await self.get_or_create_pipeline(strategy)
+
+    def _get_agent(self, pipeline: RetrievalPipeline, scope: str, k: int, temp: float):
+        """Return a cached RAG agent for the scope, building it on first use.
+
+        Agents are keyed by (scope, k, temp, system prompt hash) so only
+        `invoke` is paid per request.
+        """
+        system_prompt = load_system_prompt("./system_prompt")
+        prompt_hash = hashlib.blake2b(
+            (system_prompt or "").encode(), digest_size=16
+        ).hexdigest()
+        key = (scope, k, temp, prompt_hash)
+
+        if key not in self._agents:
+            retrieval_tool = pipeline.get_retrieval_tool(k)
+            self._agents[key] = create_rag_agent(
+                tools=[retrieval_tool], system_prompt=system_prompt, temp=temp
+            )
+        return self._agents[key]
+
+    def clear_agent_cache(self) -> None:
+        """Drop cached agents and the answers they gave, e.g. after settings they depend on change."""
+        self._agents.clear()
+        load_system_prompt.cache_clear()
+        self.query_cache.clear()
+
+    def _retrieve_docs(
+        self, pipeline: RetrievalPipeline, query: str, scope: str, k: int
+    ) -> list[Document]:
+        """Search the pipeline, serving repeat searches from the retrieval cache."""
+        retrieved_docs = self.retrieval_cache.get(query, scope, k)
+        if retrieved_docs is None:
+            retrieved_docs = pipeline.search(query, k=k)
+            self.retrieval_cache.put(query, scope, k, retrieved_docs)
+        return retrieved_docs
+
+    def clear_retrieval_cache(self, collection: str | None = None) -> None:
+        """
+        Invalidate cached search results for a collection, or all of them.
+        
+        Cached answers and SelfCheckGPT samples embed those results, so they
+        are all dropped too; answer scopes name a strategy or a collection,
+        not always both.
+        """
+        from src.retrieval.selfcheckgpt import SelfCheckGPT
+        
+        self.retrieval_cache.clear(collection)
+        self.query_cache.clear()
+        SelfCheckGPT.clear_sample_cache()
+
     def _get_pipeline_for_collection(self, collection_name: str) -> RetrievalPipeline:
         """Get or create a pipeline for a specific ChromaDB collection."""
-        if collection_name in self.pipelines:
-            return self.pipelines[collection_name]
+        if collection_name in self.collection_pipelines:
+            return self.collection_pipelines[collection_name]
         
         parts = collection_name.split("_")
         strategy_name = "function"  # Default to P1
@@ -127,38 +496,25 @@ class RAGService:
                 strategy_name = part
                 break
         
-        chunker = get_chunker(
-            strategy_name,
-            chunk_size=settings.CHUNK_SIZE,
-            chunk_overlap=settings.CHUNK_OVERLAP,
-        )
+        chunker = _get_chunker(strategy_name)
         
-        from langchain_huggingface import HuggingFaceEmbeddings
-        from langchain_astradb import AstraDBVectorStore
-        
-        embeddings = HuggingFaceEmbeddings(model_name=settings.EMBEDDING_MODEL)
-        vector_store = AstraDBVectorStore(
-            collection_name=collection_name,
-            embedding=embeddings,
-            api_endpoint=settings.ASTRA_DB_API_ENDPOINT,
-            token=settings.ASTRA_DB_APPLICATION_TOKEN,
-        )
+        # Attaches to the existing collection with the shared embedding model
+        pipeline = RetrievalPipeline(chunker=chunker, collection_name=collection_name)
         
-        pipeline = RetrievalPipeline(chunker=chunker)
-        pipeline.vector_store = vector_store
-        pipeline.embeddings = embeddings
-        
-        self.pipelines[collection_name] = pipeline
+        self.collection_pipelines[collection_name] = pipeline
         return pipeline
 
-    def index_from_zip(
+    async def index_from_zip(
         self,
         zip_file: Any,
         zip_name: str,
         strategy: ChunkingStrategy,
     ) -> tuple[int, int, str]:
         """
-        Extract and index Python files from a zip archive.
+        Index Python files from a zip archive.
+        
+        Entries are read straight from the archive into the indexing stages;
+        nothing is extracted to disk.
         
         Args:
             zip_file: SpooledTemporaryFile from FastAPI's UploadFile
@@ -167,46 +523,46 @@ class RAGService:
             
         Returns:
             Tuple of (num_documents, num_chunks, collection_name)
+            
+        Raises:
+            ZipTooLargeError: If an entry or the whole archive exceeds the
+                configured uncompressed size limits.
         """
         source_dir = Path(zip_name).stem  # Use zip name as source identifier
         
-        with tempfile.TemporaryDirectory() as tmp_dir:
-            tmp_path = Path(tmp_dir)
-            
-            # Extract zip contents
-            with zipfile.ZipFile(zip_file) as zf:
-                zf.extractall(tmp_path)
-            
-            # Collect all .py files, excluding common non-source directories
-            py_files = [
-                f for f in tmp_path.glob("**/*.py")
-                if not any(part.startswith('.') or part in ('__pycache__', 'node_modules', 'venv', '.venv')
-                           for part in f.parts)
-            ]
+        with zipfile.ZipFile(zip_file) as zf:
+            # Collect all .py entries, excluding common non-source directories
+            entries = [info for info in zf.infolist() if _is_source_entry(info)]
             
-            if not py_files:
+            if not entries:
                 return 0, 0, ""
             
-            # Load documents
-            docs = load_python_files([str(f) for f in py_files])
-            
-            if not docs:
-                return 0, 0, ""
-            
-            # Create pipeline and index
-            pipeline = self.get_or_create_pipeline(strategy, source_dir)
-            doc_ids = pipeline.index_documents(docs)
-            
-            # Build collection name (matches RetrievalPipeline naming)
-            model_slug = settings.LLM_MODEL.split("/")[-1].replace("-", "_").replace(".", "_")
-            safe_source = "".join(c if c.isalnum() else "_" for c in source_dir)
-            collection_name = f"{safe_source}_{strategy.value}_{model_slug}"
-            if len(collection_name) > 48:
-                collection_name = collection_name[:48]
+            total_size = sum(info.file_size for info in entries)
+            if total_size > settings.ZIP_MAX_TOTAL_BYTES:
+                raise ZipTooLargeError(
+                    f"Archive expands to {total_size} bytes of Python source "
+                    f"(limit {settings.ZIP_MAX_TOTAL_BYTES})"
+                )
             
-        return len(docs), len(doc_ids), collection_name
+            # Create pipeline, then read, chunk and index as overlapping stages
+            pipeline = await self.get_or_create_pipeline(strategy, source_dir)
+            if settings.USE_RAY and len(entries) >= settings.RAY_MIN_FILES:
+                docs = await asyncio.to_thread(_read_zip_entries, zf, entries)
+                num_docs, num_chunks = await self._index_docs_with_ray(pipeline, docs)
+            else:
+                num_docs, num_chunks = await self._run_index_stages(
+                    pipeline, functools.partial(self._zip_stage, zf, entries)
+                )
+        
+        if not num_docs:
+            return 0, 0, ""
+        
+        self.clear_retrieval_cache()
+        self.invalidate_collections()
+        
+        return num_docs, num_chunks, build_collection_name(strategy.value, source_dir)
 
-    def check_hallucination(
+    async def check_hallucination(
         self,
         query: str,
         response: str,
@@ -232,32 +588,134 @@ class RAGService:
         checker = SelfCheckGPT(
             chunker=pipeline.chunker,
             k=k,
+            pipeline=pipeline,
         )
         
-        similarity, is_hallucinating = checker.is_hallucinating(
+        similarity, is_hallucinating = await checker.ais_hallucinating(
             query=query,
             inital_response=response,
         )
         
         return similarity, is_hallucinating
 
-    def list_collections(self) -> list[str]:
-        """List all available collections from AstraDB."""
-        from langchain_astradb import AstraDBVectorStore
-        from langchain_huggingface import HuggingFaceEmbeddings
-        from astrapy import DataAPIClient
+    async def check_hallucinations(
+        self,
+        pairs: list[tuple[str, str]],
+        collection: str,
+        k: int = 3,
+    ) -> list[tuple[float, bool]]:
+        """
+        Check many (query, response) pairs with one batched SelfCheckGPT run.
         
-        # Use AstraDB client to list collections
-        client = DataAPIClient(settings.ASTRA_DB_APPLICATION_TOKEN)
-        db = client.get_database(settings.ASTRA_DB_API_ENDPOINT)
+        Args:
+            pairs: (query, response) pairs to check
+            collection: ChromaDB collection name to use
+            k: Number of documents to retrieve for the sampled responses
+            
+        Returns:
+            One (similarity_score, is_hallucinating) tuple per pair
+        """
+        from src.retrieval.selfcheckgpt import SelfCheckGPT
+        
+        pipeline = self._get_pipeline_for_collection(collection)
         
-        collections = []
-        for coll in db.list_collection_names():
-            collections.append(coll)
+        checker = SelfCheckGPT(
+            chunker=pipeline.chunker,
+            k=k,
+            pipeline=pipeline,
+        )
         
+        return await self._run_blocking(checker.batch_is_hallucinating, pairs)
+
+    async def list_collections(self) -> list[str]:
+        """List all available collections from AstraDB.
+
+        Results are cached for ``COLLECTIONS_TTL`` seconds so bursts of UI
+        polling collapse into a single AstraDB call.
+        """
+        timestamp, collections = self._coll_cache
+        if time.monotonic() - timestamp < COLLECTIONS_TTL:
+            return collections
+
+        async with self._coll_lock:
+            timestamp, collections = self._coll_cache
+            if time.monotonic() - timestamp >= COLLECTIONS_TTL:
+                collections = await asyncio.to_thread(
+                    _get_astra_db().list_collection_names
+                )
+                self._coll_cache = (time.monotonic(), collections)
         return collections
 
-   
+    def invalidate_collections(self) -> None:
+        """Force the next list_collections call to query AstraDB."""
+        self._coll_cache = (float("-inf"), [])
+
+
+class ZipTooLargeError(ValueError):
+    """Raised when an uploaded archive exceeds the configured size limits."""
+
+
+def _tool_documents(messages: list) -> list[Document] | None:
+    """
+    Collect the documents returned by retrieval tool calls in an agent run.
+
+    The retrieval tool returns its documents as the ToolMessage artifact, so
+    the chunks shown to the user are exactly the ones the answer was based
+    on. Returns None if the agent never called the tool.
+    """
+    tool_results = [
+        message.artifact for message in messages
+        if isinstance(message, ToolMessage) and isinstance(message.artifact, list)
+    ]
+    if not tool_results:
+        return None
+    return [doc for docs in tool_results for doc in docs]
+
+
+def _is_source_entry(info: zipfile.ZipInfo) -> bool:
+    """Whether a zip entry is a .py file outside hidden/vendored directories."""
+    if info.is_dir() or not info.filename.endswith(".py"):
+        return False
+    # Zip member names always use "/" separators, so a plain split is enough
+    parts = info.filename.split("/")
+    return SKIP_DIRS.isdisjoint(parts) and not any(part[:1] == "." for part in parts)
+
+
+def _read_zip_entry(zf: zipfile.ZipFile, info: zipfile.ZipInfo) -> Document:
+    """Read one .py entry, refusing entries that decompress past the limit."""
+    with zf.open(info) as f:
+        # Read at most one byte past the cap; headers can lie about file_size
+        data = f.read(settings.ZIP_MAX_ENTRY_BYTES + 1)
+    if len(data) > settings.ZIP_MAX_ENTRY_BYTES:
+        raise ZipTooLargeError(
+            f"{info.filename} exceeds {settings.ZIP_MAX_ENTRY_BYTES} bytes"
+        )
+    text = data.decode("utf-8", "replace")
+    return Document(
+        page_content=text,
+        metadata={
+            "source": info.filename,
+            "file_type": "python",
+            "content_hash": content_hash(text),
+        },
+    )
+
+
+def _read_zip_entries(zf: zipfile.ZipFile, entries: list[zipfile.ZipInfo]) -> list[Document]:
+    """Read many entries in parallel, preserving their order."""
+    with ThreadPoolExecutor(
+        max_workers=settings.ZIP_READ_WORKERS, thread_name_prefix="zip-read"
+    ) as pool:
+        return list(pool.map(functools.partial(_read_zip_entry, zf), entries))
+
+
+@functools.cache
+def _get_astra_db():
+    """Return the process-wide AstraDB database handle, created on first use."""
+    from astrapy import DataAPIClient
+
+    client = DataAPIClient(settings.ASTRA_DB_APPLICATION_TOKEN)
+    return client.get_database(settings.ASTRA_DB_API_ENDPOINT)
 
 
 rag_service = RAGService()
@@ -1,6 +1,8 @@
+import functools
 from pathlib import Path
 
 
+@functools.lru_cache(maxsize=4)
 def load_system_prompt(path: str, fallback: str | None = None) -> str | None:
     p = Path(path)
     if p.exists():
@@ -0,0 +1,60 @@
+"""In-process cache of parsed ASTs keyed by source content hash."""
+
+import ast
+from collections import OrderedDict
+import hashlib
+import re
+import threading
+
+_MAX_TREES = 4096
+
+# A def/class statement at the start of any line
+_DEFINITION_RE = re.compile(r"^\s*(?:async\s+)?(?:def|class)\s", re.MULTILINE)
+
+_trees: OrderedDict[bytes, ast.Module] = OrderedDict()
+_lock = threading.Lock()
+
+
+def parse_cached(source: str, filename: str = "<unknown>") -> ast.Module:
+    """
+    Parse Python source, reusing the tree for previously seen source text.
+
+    Trees are keyed by the SHA-256 of the source, so re-chunking unchanged
+    files skips parsing. Cached trees are shared between callers and must
+    not be mutated.
+
+    Args:
+        source: Python source text
+        filename: Reported in SyntaxError messages
+
+    Raises:
+        SyntaxError: If the source cannot be parsed (failures are not cached).
+    """
+    key = hashlib.sha256(source.encode("utf-8")).digest()
+
+    with _lock:
+        tree = _trees.get(key)
+        if tree is not None:
+            _trees.move_to_end(key)
+            return tree
+
+    # compile() straight to an AST, without ast.parse's wrapper or the
+    # caller's __future__ flags. The str is passed as-is: parsing the encoded
+    # bytes would let a PEP 263 coding cookie re-decode already-decoded text.
+    tree = compile(source, filename, "exec", ast.PyCF_ONLY_AST, dont_inherit=True)
+
+    with _lock:
+        _trees[key] = tree
+        while len(_trees) > _MAX_TREES:
+            _trees.popitem(last=False)
+    return tree
+
+
+def has_definitions(source: str) -> bool:
+    """
+    Cheap pre-parse check for function or class definitions.
+
+    Never false for source that defines something, so chunkers that only
+    emit definitions can skip parsing when it returns False.
+    """
+    return _DEFINITION_RE.search(source) is not None
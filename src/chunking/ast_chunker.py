@@ -1,109 +1,249 @@
 """Custom AST-based Python code chunker."""
 
 import ast
+from collections import OrderedDict
+import hashlib
 from pathlib import Path
+import threading
 from typing import List, Dict, Any, Optional
-from abc import ABC
+from dataclasses import dataclass, field
+import functools
 import logging
 
+import numpy as np
 from langchain_text_splitters import TextSplitter
 from langchain_core.documents import Document
+from .ast_cache import parse_cached
 from .base import BaseChunker
+from .lines import LineIndex
+from .parallel import parallel_map
 
 logger = logging.getLogger(__name__)
 
 
-class Chunk(ABC):
-    def __init__(self, chunk_size=1000):
-        self.chunk_size = chunk_size
-
-
-class FunctionChunk(Chunk):
+# Embedding-text layouts, built once per combination of present optional
+# sections; filling one is a single str.format call with no branching.
+
+@functools.cache
+def _function_template(has_decorators: bool, has_docstring: bool, has_complexity: bool) -> str:
+    return "\n".join(filter(None, (
+        has_decorators and "Decorators: {decorators}",
+        "Signature: {signature}",
+        has_docstring and "Documentation: {docstring}",
+        has_complexity and "Complexity: {complexity}",
+        "Code:\n{code}",
+    )))
+
+
+@functools.cache
+def _class_template(
+    has_bases: bool, has_decorators: bool, has_docstring: bool,
+    has_methods: bool, has_complexity: bool,
+) -> str:
+    return "\n".join(filter(None, (
+        "Class: {name}",
+        has_bases and "Inherits from: {bases}",
+        has_decorators and "Decorators: {decorators}",
+        has_docstring and "Documentation: {docstring}",
+        has_methods and "Methods: {methods}",
+        has_complexity and "Complexity: {complexity}",
+        "Code:\n{code}",
+    )))
+
+
+@dataclass(slots=True)
+class FunctionChunk:
     """Container for a function chunk with comprehensive metadata."""
 
-    def __init__(
-        self,
-        function_name: str,
-        function_signature: str,
-        start_line: int,
-        end_line: int,
-        original_chunk_text: str,
-        source: str = "",
-        docstring: Optional[str] = None,
-        decorators: Optional[List[str]] = None,
-        ast_node_type: str = "function",
-        complexity_score: int = 1,
-    ):
-        self.function_name = function_name
-        self.function_signature = function_signature
-        self.start_line = start_line
-        self.end_line = end_line
-        self.original_chunk_text = original_chunk_text
-        self.source = source
-        self.docstring = docstring
-        self.decorators = decorators or []
-        self.ast_node_type = ast_node_type
-        self.complexity_score = complexity_score
-        self.chunk_type = "function"
+    function_name: str
+    function_signature: str
+    start_line: int
+    end_line: int
+    original_chunk_text: str
+    source: str = ""
+    docstring: Optional[str] = None
+    decorators: List[str] = field(default_factory=list)
+    ast_node_type: str = "function"
+    complexity_score: int = 1
+    chunk_type: str = field(default="function", init=False)
+    _embedding_text: Optional[str] = field(default=None, init=False, repr=False, compare=False)
 
     def get_enhanced_embedding_text(self) -> str:
-        """Generate enhanced text for embeddings using AST metadata."""
-        parts = []
-        if self.decorators:
-            parts.append("Decorators: " + ", ".join(self.decorators))
-        parts.append(f"Signature: {self.function_signature}")
-        if self.docstring:
-            parts.append(f"Documentation: {self.docstring}")
-        if self.complexity_score > 1:
-            parts.append(f"Complexity: {self.complexity_score}")
-        parts.append(f"Code:\n{self.original_chunk_text}")
-        return "\n".join(parts)
-
-
-class ClassChunk(Chunk):
+        """Generate enhanced text for embeddings using AST metadata.
+
+        Built on first use and kept, since cached chunks are re-emitted
+        every time their file is split again.
+        """
+        if self._embedding_text is None:
+            template = _function_template(
+                bool(self.decorators), bool(self.docstring), self.complexity_score > 1
+            )
+            self._embedding_text = template.format(
+                decorators=", ".join(self.decorators),
+                signature=self.function_signature,
+                docstring=self.docstring,
+                complexity=self.complexity_score,
+                code=self.original_chunk_text,
+            )
+        return self._embedding_text
+
+
+@dataclass(slots=True)
+class ClassChunk:
     """Container for a class chunk with comprehensive metadata."""
 
-    def __init__(
-        self,
-        class_name: str,
-        start_line: int,
-        end_line: int,
-        original_chunk_text: str,
-        source: str = "",
-        docstring: Optional[str] = None,
-        base_classes: Optional[List[str]] = None,
-        decorators: Optional[List[str]] = None,
-        methods: Optional[List[str]] = None,
-        complexity_score: int = 1,
-    ):
-        self.class_name = class_name
-        self.start_line = start_line
-        self.end_line = end_line
-        self.original_chunk_text = original_chunk_text
-        self.source = source
-        self.docstring = docstring
-        self.base_classes = base_classes or []
-        self.decorators = decorators or []
-        self.methods = methods or []
-        self.complexity_score = complexity_score
-        self.chunk_type = "class"
+    class_name: str
+    start_line: int
+    end_line: int
+    original_chunk_text: str
+    source: str = ""
+    docstring: Optional[str] = None
+    base_classes: List[str] = field(default_factory=list)
+    decorators: List[str] = field(default_factory=list)
+    methods: List[str] = field(default_factory=list)
+    complexity_score: int = 1
+    chunk_type: str = field(default="class", init=False)
+    _embedding_text: Optional[str] = field(default=None, init=False, repr=False, compare=False)
 
     def get_enhanced_embedding_text(self) -> str:
-        """Generate enhanced text for embeddings using AST metadata."""
-        parts = []
-        parts.append(f"Class: {self.class_name}")
-        if self.base_classes:
-            parts.append(f"Inherits from: {', '.join(self.base_classes)}")
-        if self.decorators:
-            parts.append(f"Decorators: {', '.join(self.decorators)}")
-        if self.docstring:
-            parts.append(f"Documentation: {self.docstring}")
-        if self.methods:
-            parts.append(f"Methods: {', '.join(self.methods)}")
-        if self.complexity_score > 1:
-            parts.append(f"Complexity: {self.complexity_score}")
-        parts.append(f"Code:\n{self.original_chunk_text}")
-        return "\n".join(parts)
+        """Generate enhanced text for embeddings using AST metadata.
+
+        Built on first use and kept, like `FunctionChunk.get_enhanced_embedding_text`.
+        """
+        if self._embedding_text is None:
+            template = _class_template(
+                bool(self.base_classes), bool(self.decorators), bool(self.docstring),
+                bool(self.methods), self.complexity_score > 1,
+            )
+            self._embedding_text = template.format(
+                name=self.class_name,
+                bases=", ".join(self.base_classes),
+                decorators=", ".join(self.decorators),
+                docstring=self.docstring,
+                methods=", ".join(self.methods),
+                complexity=self.complexity_score,
+                code=self.original_chunk_text,
+            )
+        return self._embedding_text
+
+
+def _unparse_name(node: ast.expr) -> str:
+    """
+    Unparse an expression, short-circuiting plain and dotted names.
+
+    Most decorators, base classes and annotations are `name` or `module.name`;
+    those are rebuilt directly instead of constructing an ast unparser.
+    """
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute) and isinstance(node.value, (ast.Name, ast.Attribute)):
+        return f"{_unparse_name(node.value)}.{node.attr}"
+    return ast.unparse(node)
+
+
+class _ChunkVisitor(ast.NodeVisitor):
+    """
+    Collects class and function chunks in a single traversal.
+
+    Methods are not emitted as separate chunks: their text is already part
+    of the class chunk. Nested functions inside functions get their own chunks.
+    As before, only classes directly in the module body get class chunks;
+    classes under functions or module-level if/try/with blocks do not.
+
+    Cyclomatic complexity is accumulated on the way down instead of walking
+    each function subtree again: every open function has a counter on
+    `_complexity`, and a finished function folds its branches into its parent.
+    """
+
+    # Exact node type -> branches added; BoolOp (-1) adds len(values) - 1
+    _BRANCH_WEIGHTS = {
+        ast.If: 1, ast.While: 1, ast.For: 1, ast.Try: 1, ast.ExceptHandler: 1,
+        ast.BoolOp: -1,
+    }
+
+    def __init__(self, splitter: "ASTTextSplitter", text: str, source: str):
+        self.splitter = splitter
+        self.lines = LineIndex(text)
+        self.source = source
+        self.chunks: List[FunctionChunk | ClassChunk] = []
+        self._complexity: List[int] = []
+        self._class_depth = 0
+        self._top_level_classes: set[ast.ClassDef] = set()
+
+    def _span(self, node: ast.AST) -> tuple[int, int, str]:
+        start_line = node.lineno
+        end_line = node.end_lineno if node.end_lineno else start_line
+        return start_line, end_line, self.lines.slice(start_line, end_line)
+
+    def visit_Module(self, node: ast.Module) -> None:
+        self._top_level_classes = {item for item in node.body if isinstance(item, ast.ClassDef)}
+        self.generic_visit(node)
+
+    def visit_ClassDef(self, node: ast.ClassDef) -> None:
+        chunk = None
+        if node in self._top_level_classes:
+            start_line, end_line, original_text = self._span(node)
+            chunk = ClassChunk(
+                class_name=node.name,
+                start_line=start_line,
+                end_line=end_line,
+                original_chunk_text=original_text,
+                source=self.source,
+                docstring=self.splitter.extract_class_docstring(node),
+                base_classes=self.splitter.extract_base_classes(node),
+                decorators=self.splitter.extract_class_decorators(node),
+                methods=self.splitter.extract_class_methods(node),
+            )
+            self.chunks.append(chunk)
+
+        complexity = 1
+        self._class_depth += 1
+        # Decorators and bases count too when the class is inside a function
+        for child in ast.iter_child_nodes(node):
+            method_complexity = self.visit(child)
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                complexity += method_complexity
+        self._class_depth -= 1
+
+        if chunk is not None:
+            chunk.complexity_score = complexity
+
+    def visit_FunctionDef(self, node: ast.FunctionDef | ast.AsyncFunctionDef) -> int:
+        chunk = None
+        if self._class_depth == 0:
+            start_line, end_line, original_text = self._span(node)
+            chunk = FunctionChunk(
+                function_name=node.name,
+                function_signature=self.splitter.extract_function_signature(node),
+                start_line=start_line,
+                end_line=end_line,
+                original_chunk_text=original_text,
+                source=self.source,
+                docstring=self.splitter.extract_docstring(node),
+                decorators=self.splitter.extract_decorators(node),
+                ast_node_type="async_function" if isinstance(node, ast.AsyncFunctionDef) else "function",
+            )
+            self.chunks.append(chunk)
+
+        self._complexity.append(1)
+        self.generic_visit(node)
+        complexity = self._complexity.pop()
+        if self._complexity:
+            # Enclosing functions count branches of everything nested in them
+            self._complexity[-1] += complexity - 1
+
+        if chunk is not None:
+            chunk.complexity_score = complexity
+        return complexity
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def generic_visit(self, node: ast.AST) -> None:
+        if self._complexity:
+            weight = self._BRANCH_WEIGHTS.get(type(node))
+            if weight is not None:
+                self._complexity[-1] += weight if weight > 0 else len(node.values) - 1
+        super().generic_visit(node)
 
 
 class ASTTextSplitter(TextSplitter):
@@ -111,42 +251,40 @@ class ASTTextSplitter(TextSplitter):
 
     def extract_function_signature(self, node: ast.FunctionDef | ast.AsyncFunctionDef) -> str:
         """Extract clean function signature from AST node."""
+        arguments = node.args
         args = []
-        for i, arg in enumerate(node.args.args):
+        defaults_offset = len(arguments.args) - len(arguments.defaults)
+        for i, arg in enumerate(arguments.args):
             arg_str = arg.arg
             if arg.annotation:
-                arg_str += f": {ast.unparse(arg.annotation)}"
-            defaults_offset = len(node.args.args) - len(node.args.defaults)
+                arg_str += f": {_unparse_name(arg.annotation)}"
             if i >= defaults_offset:
-                default_idx = i - defaults_offset
-                arg_str += f" = {ast.unparse(node.args.defaults[default_idx])}"
+                arg_str += f" = {ast.unparse(arguments.defaults[i - defaults_offset])}"
             args.append(arg_str)
 
-        if node.args.vararg:
-            vararg_str = f"*{node.args.vararg.arg}"
-            if node.args.vararg.annotation:
-                vararg_str += f": {ast.unparse(node.args.vararg.annotation)}"
+        if arguments.vararg:
+            vararg_str = f"*{arguments.vararg.arg}"
+            if arguments.vararg.annotation:
+                vararg_str += f": {_unparse_name(arguments.vararg.annotation)}"
             args.append(vararg_str)
 
-        for i, arg in enumerate(node.args.kwonlyargs):
+        for arg, default_val in zip(arguments.kwonlyargs, arguments.kw_defaults):
             kwarg_str = arg.arg
             if arg.annotation:
-                kwarg_str += f": {ast.unparse(arg.annotation)}"
-            if i < len(node.args.kw_defaults):
-                default_val = node.args.kw_defaults[i]
-                if default_val is not None:
-                    kwarg_str += f" = {ast.unparse(default_val)}"
+                kwarg_str += f": {_unparse_name(arg.annotation)}"
+            if default_val is not None:
+                kwarg_str += f" = {ast.unparse(default_val)}"
             args.append(kwarg_str)
 
-        if node.args.kwarg:
-            kwarg_str = f"**{node.args.kwarg.arg}"
-            if node.args.kwarg.annotation:
-                kwarg_str += f": {ast.unparse(node.args.kwarg.annotation)}"
+        if arguments.kwarg:
+            kwarg_str = f"**{arguments.kwarg.arg}"
+            if arguments.kwarg.annotation:
+                kwarg_str += f": {_unparse_name(arguments.kwarg.annotation)}"
             args.append(kwarg_str)
 
         return_annotation = ""
         if node.returns:
-            return_annotation = f" -> {ast.unparse(node.returns)}"
+            return_annotation = f" -> {_unparse_name(node.returns)}"
 
         prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
         return f"{prefix} {node.name}({', '.join(args)}){return_annotation}:"
@@ -164,21 +302,11 @@ class ASTTextSplitter(TextSplitter):
         decorators = []
         for decorator in node.decorator_list:
             try:
-                decorators.append(ast.unparse(decorator))
+                decorators.append(_unparse_name(decorator))
             except Exception:
                 decorators.append(str(decorator))
         return decorators
 
-    def calculate_complexity(self, node: ast.FunctionDef | ast.AsyncFunctionDef) -> int:
-        """Calculate rough cyclomatic complexity."""
-        complexity = 1
-        for child in ast.walk(node):
-            if isinstance(child, (ast.If, ast.While, ast.For, ast.Try, ast.ExceptHandler)):
-                complexity += 1
-            elif isinstance(child, ast.BoolOp):
-                complexity += len(child.values) - 1
-        return complexity
-
     def extract_class_docstring(self, node: ast.ClassDef) -> Optional[str]:
         if (node.body and isinstance(node.body[0], ast.Expr)
             and isinstance(node.body[0].value, ast.Constant)
@@ -190,7 +318,7 @@ class ASTTextSplitter(TextSplitter):
         decorators = []
         for decorator in node.decorator_list:
             try:
-                decorators.append(ast.unparse(decorator))
+                decorators.append(_unparse_name(decorator))
             except Exception:
                 decorators.append(str(decorator))
         return decorators
@@ -199,7 +327,7 @@ class ASTTextSplitter(TextSplitter):
         base_classes = []
         for base in node.bases:
             try:
-                base_classes.append(ast.unparse(base))
+                base_classes.append(_unparse_name(base))
             except Exception:
                 base_classes.append(str(base))
         return base_classes
@@ -211,65 +339,13 @@ class ASTTextSplitter(TextSplitter):
                 methods.append(item.name)
         return methods
 
-    def calculate_class_complexity(self, node: ast.ClassDef) -> int:
-        complexity = 1
-        for item in node.body:
-            if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
-                complexity += self.calculate_complexity(item)
-        return complexity
-
     def split_text(self, text: str, source: str = "") -> List[FunctionChunk | ClassChunk]:
         """Split Python code into AST-based chunks."""
         try:
-            tree = ast.parse(text)
-            source_lines = text.split("\n")
-            chunks = []
-
-            # Extract classes
-            for node in tree.body:
-                if isinstance(node, ast.ClassDef):
-                    start_line = node.lineno
-                    end_line = node.end_lineno if node.end_lineno else start_line
-                    class_lines = source_lines[start_line - 1 : end_line]
-                    original_text = "\n".join(class_lines)
-
-                    class_chunk = ClassChunk(
-                        class_name=node.name,
-                        start_line=start_line,
-                        end_line=end_line,
-                        original_chunk_text=original_text,
-                        source=source,
-                        docstring=self.extract_class_docstring(node),
-                        base_classes=self.extract_base_classes(node),
-                        decorators=self.extract_class_decorators(node),
-                        methods=self.extract_class_methods(node),
-                        complexity_score=self.calculate_class_complexity(node),
-                    )
-                    chunks.append(class_chunk)
-
-            # Extract functions
-            for node in ast.walk(tree):
-                if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
-                    start_line = node.lineno
-                    end_line = node.end_lineno if node.end_lineno else start_line
-                    function_lines = source_lines[start_line - 1 : end_line]
-                    original_text = "\n".join(function_lines)
-
-                    chunk = FunctionChunk(
-                        function_name=node.name,
-                        function_signature=self.extract_function_signature(node),
-                        start_line=start_line,
-                        end_line=end_line,
-                        original_chunk_text=original_text,
-                        source=source,
-                        docstring=self.extract_docstring(node),
-                        decorators=self.extract_decorators(node),
-                        ast_node_type="async_function" if isinstance(node, ast.AsyncFunctionDef) else "function",
-                        complexity_score=self.calculate_complexity(node),
-                    )
-                    chunks.append(chunk)
-
-            return chunks
+            tree = parse_cached(text, source or "<unknown>")
+            visitor = _ChunkVisitor(self, text, source)
+            visitor.visit(tree)
+            return visitor.chunks
 
         except SyntaxError as e:
             logger.error(f"Syntax error: {e}")
@@ -279,22 +355,114 @@ class ASTTextSplitter(TextSplitter):
             return []
 
 
+# Integer codes for chunk_type in `ASTChunker.split_soa`
+CHUNK_TYPE_IDS = {"function": 0, "class": 1}
+
+_splitter = ASTTextSplitter()
+
+
+def _split_one(text: str, source: str) -> tuple[FunctionChunk | ClassChunk, ...]:
+    """Split one file; module-level so it can run in a worker process."""
+    return tuple(_splitter.split_text(text, source=source))
+
+
 class ASTChunker(BaseChunker):
     """AST-based chunker that integrates with the chunking pipeline."""
     
     name = "ast"
     
+    # split_text results shared by all AST-based chunkers, keyed by content hash
+    _split_cache: "OrderedDict[tuple[bytes, str], tuple[FunctionChunk | ClassChunk, ...]]" = OrderedDict()
+    _split_cache_size = 4096
+    _split_cache_lock = threading.Lock()
+    
     def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200, **kwargs):
         self.splitter = ASTTextSplitter()
         self.chunk_size = chunk_size
+        self.cache_hits = 0
+        self.cache_misses = 0
+    
+    def _split_text_cached(self, text: str, source: str) -> List[FunctionChunk | ClassChunk]:
+        """Split text, reusing earlier results for identical (text, source)."""
+        return self._split_documents([(text, source)])[0]
+    
+    def _split_documents(self, items: list[tuple[str, str]]) -> list[List[FunctionChunk | ClassChunk]]:
+        """
+        Split many (text, source) pairs, reusing cached results.
+        
+        Cache misses are parsed in a process pool once there are enough of
+        them to outweigh the pickling overhead, otherwise in this process.
+        """
+        cache = ASTChunker._split_cache
+        keys = [
+            (hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest(), source)
+            for text, source in items
+        ]
+        results: list[tuple | None] = [None] * len(items)
+        
+        with self._split_cache_lock:
+            for i, key in enumerate(keys):
+                chunks = cache.get(key)
+                if chunks is not None:
+                    cache.move_to_end(key)
+                    results[i] = chunks
+            misses = [i for i, chunks in enumerate(results) if chunks is None]
+            self.cache_hits += len(items) - len(misses)
+            self.cache_misses += len(misses)
+        
+        if misses:
+            texts = [items[i][0] for i in misses]
+            sources = [items[i][1] for i in misses]
+            split = parallel_map(_split_one, texts, sources)
+            
+            with self._split_cache_lock:
+                for i, chunks in zip(misses, split):
+                    cache[keys[i]] = results[i] = chunks
+                while len(cache) > self._split_cache_size:
+                    cache.popitem(last=False)
+        
+        return [list(chunks) for chunks in results]
+    
+    def split_soa(self, documents: list[Document]) -> dict[str, Any]:
+        """
+        Split documents into parallel arrays instead of Document objects.
+        
+        Suited to callers that embed `texts` in one batch and only need
+        positional metadata as arrays.
+        
+        Returns:
+            Dict with "texts", "sources" and "names" lists, plus numpy arrays
+            "starts", "ends", "complexity" (int32) and "types" (int8, see
+            `CHUNK_TYPE_IDS`), all of equal length.
+        """
+        sources = [doc.metadata.get("source", "") for doc in documents]
+        split = self._split_documents(
+            [(doc.page_content, source) for doc, source in zip(documents, sources)]
+        )
+        chunks = [chunk for file_chunks in split for chunk in file_chunks]
+        return {
+            "texts": [chunk.get_enhanced_embedding_text() for chunk in chunks],
+            "sources": [chunk.source for chunk in chunks],
+            "names": [
+                chunk.function_name if isinstance(chunk, FunctionChunk) else chunk.class_name
+                for chunk in chunks
+            ],
+            "starts": np.fromiter((c.start_line for c in chunks), np.int32, len(chunks)),
+            "ends": np.fromiter((c.end_line for c in chunks), np.int32, len(chunks)),
+            "complexity": np.fromiter((c.complexity_score for c in chunks), np.int32, len(chunks)),
+            "types": np.fromiter(
+                (CHUNK_TYPE_IDS[c.chunk_type] for c in chunks), np.int8, len(chunks)
+            ),
+        }
     
     def split(self, documents: list[Document]) -> list[Document]:
         """Split documents into AST-based chunks, returning LangChain Documents."""
         result = []
-        for doc in documents:
-            source = doc.metadata.get("source", "")
-            chunks = self.splitter.split_text(doc.page_content, source=source)
-            
+        sources = [doc.metadata.get("source", "") for doc in documents]
+        split = self._split_documents(
+            [(doc.page_content, source) for doc, source in zip(documents, sources)]
+        )
+        for source, chunks in zip(sources, split):
             for chunk in chunks:
                 # Convert to LangChain Document with enhanced text
                 result.append(Document(
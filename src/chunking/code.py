@@ -3,6 +3,7 @@
 from langchain_text_splitters import RecursiveCharacterTextSplitter, Language
 from langchain_core.documents import Document
 from .base import BaseChunker
+from .parallel import split_documents
 
 
 class CodeChunker(BaseChunker):
@@ -15,7 +16,8 @@ class CodeChunker(BaseChunker):
             language=language,
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap,
+            add_start_index=True,
         )
     
     def split(self, documents: list[Document]) -> list[Document]:
-        return self.splitter.split_documents(documents)
+        return split_documents(self.splitter, documents)
@@ -15,10 +15,12 @@ class ContextEnrichedChunker(ASTChunker):
     def split(self, documents: list[Document]) -> list[Document]:
         """Split with relative positioning metadata."""
         result = []
+        sources = [doc.metadata.get("source", "") for doc in documents]
+        split = self._split_documents(
+            [(doc.page_content, source) for doc, source in zip(documents, sources)]
+        )
         
-        for doc in documents:
-            source = doc.metadata.get("source", "")
-            chunks = self.splitter.split_text(doc.page_content, source=source)
+        for source, chunks in zip(sources, split):
             
             # Sort by line number for proper ordering
             chunks.sort(key=lambda c: c.start_line)
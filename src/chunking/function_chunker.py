@@ -1,8 +1,21 @@
 """P1 Baseline: Simple function-level splitting without enrichment."""
 
 import ast
+import functools
+import logging
+
 from langchain_core.documents import Document
+
+from src.config import settings
+from .ast_cache import has_definitions, parse_cached
 from .base import BaseChunker
+from .lines import LineIndex
+from .parallel import parallel_map
+
+logger = logging.getLogger(__name__)
+
+# Exact-type membership is cheaper than isinstance; ast node classes are final
+_DEFINITION_TYPES = frozenset({ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef})
 
 
 class FunctionChunker(BaseChunker):
@@ -19,38 +32,110 @@ class FunctionChunker(BaseChunker):
     def split(self, documents: list[Document]) -> list[Document]:
         """Split documents by top-level functions and classes only."""
         result = []
+        sources = [doc.metadata.get("source", "") for doc in documents]
+        codes = [doc.page_content for doc in documents]
         
-        for doc in documents:
-            source = doc.metadata.get("source", "")
-            chunks = self._extract_top_level(doc.page_content, source)
+        for chunks in parallel_map(_extract_top_level, codes, sources):
             result.extend(chunks)
         
         return result
     
     def _extract_top_level(self, code: str, source: str) -> list[Document]:
         """Extract top-level functions and classes as plain text."""
+        return _extract_top_level(code, source)
+
+
+def _extract_top_level(code: str, source: str) -> list[Document]:
+    """Extract top-level functions and classes; module-level so it can run in a worker process."""
+    if not has_definitions(code):
+        return []
+    spans = _tree_sitter_spans(code) if settings.USE_TREE_SITTER else None
+    if spans is None:
         try:
-            tree = ast.parse(code)
+            tree = parse_cached(code, source or "<unknown>")
         except SyntaxError:
             # Fallback: return entire file as one chunk
             return [Document(page_content=code, metadata={"source": source})]
+        spans = [
+            (node.lineno, node.end_lineno)
+            for node in tree.body
+            if type(node) in _DEFINITION_TYPES
+        ]
+    
+    lines = LineIndex(code)
+    chunks = []
+    
+    for start_line, end_line in spans:
+        chunk_text = lines.slice(start_line, end_line or start_line)
         
-        lines = code.split("\n")
-        chunks = []
-        
-        for node in tree.body:
-            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
-                start = node.lineno - 1
-                end = node.end_lineno or start + 1
-                chunk_text = "\n".join(lines[start:end])
-                
-                chunks.append(Document(
-                    page_content=chunk_text,
-                    metadata={
-                        "source": source,
-                        "start_line": node.lineno,
-                        "end_line": node.end_lineno,
-                    }
-                ))
-        
-        return chunks
\ No newline at end of file
+        chunks.append(Document(
+            page_content=chunk_text,
+            metadata={
+                "source": source,
+                "start_line": start_line,
+                "end_line": end_line,
+            }
+        ))
+    
+    return chunks
+
+
+_TS_DEFINITIONS = frozenset({"function_definition", "class_definition"})
+
+
+@functools.cache
+def _tree_sitter_language():
+    """Return the tree-sitter Python grammar, or None if it is not installed."""
+    try:
+        import tree_sitter_python
+        from tree_sitter import Language
+    except ImportError:
+        logger.warning("USE_TREE_SITTER is set but tree-sitter-python is not installed")
+        return None
+    return Language(tree_sitter_python.language())
+
+
+def _tree_sitter_spans(code: str) -> list[tuple[int, int]] | None:
+    """
+    Line spans of top-level functions and classes, parsed with tree-sitter.
+    
+    Spans match what `ast` reports: decorators are excluded, as in
+    `FunctionDef.lineno`. Returns None if tree-sitter is unavailable or the
+    code has syntax errors, so the caller falls back to `ast`.
+    """
+    language = _tree_sitter_language()
+    if language is None:
+        return None
+    
+    from tree_sitter import Parser
+    
+    root = Parser(language).parse(code.encode("utf-8")).root_node
+    if root.has_error:
+        return None
+    
+    spans = []
+    for node in root.named_children:
+        if node.type == "decorated_definition":
+            node = node.child_by_field_name("definition")
+        if node is not None and node.type in _TS_DEFINITIONS:
+            spans.append((node.start_point[0] + 1, _code_end_row(node) + 1))
+    return spans
+
+
+def _code_end_row(node) -> int:
+    """
+    Last row of `node`, ignoring trailing comments.
+    
+    tree-sitter keeps a comment after the last statement inside the block,
+    while `ast` end_lineno stops at the statement.
+    """
+    children = node.children
+    last = len(children)
+    while last and children[last - 1].type == "comment":
+        last -= 1
+    if not last:
+        return node.end_point[0]
+    child = children[last - 1]
+    if last < len(children) or child.end_point == node.end_point:
+        return _code_end_row(child)
+    return node.end_point[0]
@@ -1,9 +1,19 @@
 """P4: GraphRAG chunker that extracts code relationships."""
 
 import ast
+import sys
 from typing import Dict, List, Set
 from langchain_core.documents import Document
+from .ast_cache import has_definitions, parse_cached
+from .ast_chunker import _unparse_name
 from .base import BaseChunker
+from .lines import LineIndex
+from .parallel import parallel_map
+
+
+# Exact-type membership is cheaper than isinstance; ast node classes are final
+_FUNCTION_TYPES = frozenset({ast.FunctionDef, ast.AsyncFunctionDef})
+_DEFINITION_TYPES = _FUNCTION_TYPES | {ast.ClassDef}
 
 
 class GraphChunker(BaseChunker):
@@ -20,63 +30,53 @@ class GraphChunker(BaseChunker):
     def split(self, documents: list[Document]) -> list[Document]:
         """Extract entities with relationship metadata."""
         result = []
+        sources = [doc.metadata.get("source", "") for doc in documents]
+        codes = [doc.page_content for doc in documents]
         
-        for doc in documents:
-            source = doc.metadata.get("source", "")
-            entities = self._extract_entities_with_relations(doc.page_content, source)
-            result.extend(entities)
+        for entities in parallel_map(_extract_entities, codes, sources):
+            result.extend(_intern_names(entities))
         
         return result
     
     def _extract_entities_with_relations(self, code: str, source: str) -> list[Document]:
         """Extract functions/classes with their relationships."""
+        if not has_definitions(code):
+            return []
         try:
-            tree = ast.parse(code)
+            tree = parse_cached(code, source or "<unknown>")
         except SyntaxError:
             return []
         
-        lines = code.split("\n")
-        chunks = []
-        
-        # First pass: collect all defined names
-        defined_names: Set[str] = set()
-        for node in ast.walk(tree):
-            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
-                defined_names.add(node.name)
-            elif isinstance(node, ast.ClassDef):
-                defined_names.add(node.name)
-        
-        # Extract imports
-        imports: List[str] = []
-        for node in tree.body:
-            if isinstance(node, ast.Import):
-                imports.extend(alias.name for alias in node.names)
-            elif isinstance(node, ast.ImportFrom):
-                module = node.module or ""
-                imports.append(module)
+        lines = LineIndex(code)
         
-        # Process classes
-        for node in tree.body:
-            if isinstance(node, ast.ClassDef):
-                chunk = self._process_class(node, lines, source, defined_names, imports)
-                chunks.append(chunk)
+        # Single pass: defined names, imports and per-entity calls
+        scan = _GraphScan()
+        scan.scan(tree)
+        defined_names = scan.defined_names
+        imports = scan.imports
         
-        # Process top-level functions
-        for node in tree.body:
-            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
-                chunk = self._process_function(node, lines, source, defined_names, imports)
-                chunks.append(chunk)
+        # Classes first, then top-level functions
+        chunks = [
+            self._process_class(node, lines, source, _resolve_calls(calls, defined_names), imports)
+            for node, calls in scan.classes
+        ]
+        chunks.extend(
+            self._process_function(node, lines, source, _resolve_calls(calls, defined_names), imports)
+            for node, calls in scan.functions
+        )
         
         return chunks
     
-    def _process_function(self, node, lines, source, defined_names, imports) -> Document:
+    def _process_function(
+        self,
+        node: ast.FunctionDef | ast.AsyncFunctionDef,
+        lines: LineIndex,
+        source: str,
+        calls: Set[str],
+        imports: List[str],
+    ) -> Document:
         """Extract function with CALLS relationships."""
-        start = node.lineno - 1
-        end = node.end_lineno or start + 1
-        chunk_text = "\n".join(lines[start:end])
-        
-        # Find all function calls within this function
-        calls = self._extract_calls(node, defined_names)
+        chunk_text = lines.slice(node.lineno, node.end_lineno or node.lineno)
         
         return Document(
             page_content=chunk_text,
@@ -92,25 +92,27 @@ class GraphChunker(BaseChunker):
             }
         )
     
-    def _process_class(self, node: ast.ClassDef, lines, source, defined_names, imports) -> Document:
+    def _process_class(
+        self,
+        node: ast.ClassDef,
+        lines: LineIndex,
+        source: str,
+        calls: Set[str],
+        imports: List[str],
+    ) -> Document:
         """Extract class with INHERITS and contains relationships."""
-        start = node.lineno - 1
-        end = node.end_lineno or start + 1
-        chunk_text = "\n".join(lines[start:end])
+        chunk_text = lines.slice(node.lineno, node.end_lineno or node.lineno)
         
         # Extract base classes
-        inherits = []
+        inherits: List[str] = []
         for base in node.bases:
             try:
-                inherits.append(ast.unparse(base))
-            except:
+                inherits.append(_unparse_name(base))
+            except Exception:
                 pass
         
         # Extract method names
-        methods = [n.name for n in node.body if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef))]
-        
-        # Find all calls within the class
-        calls = self._extract_calls(node, defined_names)
+        methods = [n.name for n in node.body if type(n) in _FUNCTION_TYPES]
         
         return Document(
             page_content=chunk_text,
@@ -127,15 +129,126 @@ class GraphChunker(BaseChunker):
                 "imports": imports,
             }
         )
+
+
+_chunker = GraphChunker()
+
+
+def _extract_entities(code: str, source: str) -> list[Document]:
+    """Extract one file's entities; module-level so it can run in a worker process."""
+    return _chunker._extract_entities_with_relations(code, source)
+
+
+# Metadata lists holding entity or module names
+_NAME_LIST_KEYS = ("calls", "inherits_from", "contains_methods", "imports")
+
+
+def _intern_names(chunks: list[Document]) -> list[Document]:
+    """
+    Intern the entity and module names in one file's chunks, in place.
     
-    def _extract_calls(self, node, defined_names: Set[str]) -> Set[str]:
-        """Find all calls to known functions/classes within a node."""
-        calls = set()
-        for child in ast.walk(node):
-            if isinstance(child, ast.Call):
-                if isinstance(child.func, ast.Name):
-                    if child.func.id in defined_names:
-                        calls.add(child.func.id)
-                elif isinstance(child.func, ast.Attribute):
-                    calls.add(child.func.attr)
-        return calls
\ No newline at end of file
+    The parser interns identifiers, but chunks returned from worker processes
+    carry fresh copies of every string. Interning makes names repeated across
+    files (common calls, imported modules) share one object again. Lists that
+    are shared between chunks, like a file's imports, stay shared.
+    """
+    seen = set()
+    for chunk in chunks:
+        meta = chunk.metadata
+        meta["name"] = sys.intern(meta["name"])
+        for key in _NAME_LIST_KEYS:
+            names = meta.get(key)
+            if names is not None and id(names) not in seen:
+                seen.add(id(names))
+                names[:] = map(sys.intern, names)
+    return chunks
+
+
+class _GraphScan:
+    """
+    Collects everything GraphChunker needs in one traversal.
+    
+    Records every defined function/class name, top-level imports, and the
+    calls made inside each top-level class or function. Calls by plain name
+    can only be matched against defined names once the whole file has been
+    seen, so they are kept apart from attribute calls until then.
+    
+    The tree is walked with an explicit stack rather than ast.NodeVisitor,
+    skipping its per-node method lookup and recursive generic_visit.
+    """
+    
+    def __init__(self):
+        self.defined_names: Set[str] = set()
+        self.imports: List[str] = []
+        self.classes: List[tuple[ast.ClassDef, tuple[Set[str], Set[str]]]] = []
+        self.functions: List[tuple[ast.FunctionDef | ast.AsyncFunctionDef, tuple[Set[str], Set[str]]]] = []
+    
+    def _add_import(self, stmt: ast.Import) -> None:
+        self.imports.extend(alias.name for alias in stmt.names)
+    
+    def _add_import_from(self, stmt: ast.ImportFrom) -> None:
+        self.imports.append(stmt.module or "")
+    
+    def _add_class(self, stmt: ast.ClassDef) -> tuple[Set[str], Set[str]]:
+        calls = (set(), set())
+        self.classes.append((stmt, calls))
+        return calls
+    
+    def _add_function(self, stmt: ast.FunctionDef | ast.AsyncFunctionDef) -> tuple[Set[str], Set[str]]:
+        calls = (set(), set())
+        self.functions.append((stmt, calls))
+        return calls
+    
+    # Top-level statement type -> handler, returning the (name calls,
+    # attribute calls) sets to fill for entities and None otherwise
+    _HANDLERS = {
+        ast.Import: _add_import,
+        ast.ImportFrom: _add_import_from,
+        ast.ClassDef: _add_class,
+        ast.FunctionDef: _add_function,
+        ast.AsyncFunctionDef: _add_function,
+    }
+    
+    def scan(self, tree: ast.Module) -> None:
+        defined_names = self.defined_names
+        handlers = self._HANDLERS
+        # Globals and attributes used per node, bound to locals once
+        definition_types = _DEFINITION_TYPES
+        call_recorders = _CALL_RECORDERS
+        call_type = ast.Call
+        node_base = ast.AST
+        for stmt in tree.body:
+            handler = handlers.get(type(stmt))
+            calls = handler(self, stmt) if handler is not None else None
+            
+            stack = [stmt]
+            while stack:
+                node = stack.pop()
+                node_type = type(node)
+                if node_type in definition_types:
+                    defined_names.add(node.name)
+                elif node_type is call_type and calls is not None:
+                    record = call_recorders.get(type(node.func))
+                    if record is not None:
+                        record(calls, node.func)
+                
+                # Inlined ast.iter_child_nodes
+                for field in node._fields:
+                    value = getattr(node, field, None)
+                    if type(value) is list:
+                        stack.extend([item for item in value if isinstance(item, node_base)])
+                    elif isinstance(value, node_base):
+                        stack.append(value)
+
+
+# Call target type -> how to record it into (name calls, attribute calls)
+_CALL_RECORDERS = {
+    ast.Name: lambda calls, func: calls[0].add(func.id),
+    ast.Attribute: lambda calls, func: calls[1].add(func.attr),
+}
+
+
+def _resolve_calls(calls: tuple[Set[str], Set[str]], defined_names: Set[str]) -> Set[str]:
+    """Keep calls to known functions/classes, plus every attribute call."""
+    name_calls, attribute_calls = calls
+    return (name_calls & defined_names) | attribute_calls
@@ -0,0 +1,46 @@
+"""Line-range slicing of source text without splitting it into lines."""
+
+from typing import List
+
+import numpy as np
+
+# Texts at least this long have their newlines located with numpy
+NUMPY_SCAN_MIN_CHARS = 100_000
+
+
+def line_starts(text: str) -> List[int]:
+    """Return the offset at which each line of `text` starts."""
+    if len(text) >= NUMPY_SCAN_MIN_CHARS and text.isascii():
+        # For ASCII text byte offsets equal character offsets, so one
+        # vectorised comparison over the encoded buffer finds every newline
+        buf = np.frombuffer(text.encode("ascii"), dtype=np.uint8)
+        return [0, *(np.flatnonzero(buf == 10) + 1).tolist()]
+
+    starts = [0]
+    pos = text.find("\n")
+    while pos != -1:
+        starts.append(pos + 1)
+        pos = text.find("\n", pos + 1)
+    return starts
+
+
+class LineIndex:
+    """
+    Line start offsets of a text, for cutting out line ranges.
+
+    `slice(a, b)` equals `"\\n".join(text.split("\\n")[a - 1:b])` but copies
+    only the requested characters, once, instead of materialising every line.
+    """
+
+    __slots__ = ("text", "starts")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.starts = line_starts(text)
+
+    def slice(self, start_line: int, end_line: int) -> str:
+        """Lines `start_line` to `end_line` (1-based, inclusive), without the final newline."""
+        starts = self.starts
+        start = starts[start_line - 1]
+        end = starts[end_line] - 1 if end_line < len(starts) else len(self.text)
+        return self.text[start:end]
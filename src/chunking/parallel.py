@@ -0,0 +1,66 @@
+"""Shared process pool for CPU-bound per-file chunking."""
+
+from collections.abc import Callable, Sequence
+from concurrent.futures import ProcessPoolExecutor
+import functools
+import multiprocessing
+import sys
+import threading
+from typing import TypeVar
+
+from langchain_core.documents import Document
+
+from src.config import settings
+
+T = TypeVar("T")
+
+_process_pool: ProcessPoolExecutor | None = None
+_process_pool_lock = threading.Lock()
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """
+    Return the shared chunking process pool, starting it on first use.
+
+    Workers are started with forkserver ("spawn" on Windows), not fork:
+    the pool is created from a worker thread of a server whose event loop,
+    thread pools and store clients must not be copied into children.
+    """
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            context = multiprocessing.get_context("spawn" if sys.platform == "win32" else "forkserver")
+            _process_pool = ProcessPoolExecutor(
+                max_workers=settings.CHUNK_PROCESS_WORKERS, mp_context=context
+            )
+        return _process_pool
+
+
+def parallel_map(fn: Callable[..., T], *args: Sequence) -> list[T]:
+    """
+    `map(fn, *args)` across worker processes when there is enough work.
+
+    Batches smaller than `settings.CHUNK_PROCESS_MIN_DOCS` run in this
+    process, where pickling overhead would outweigh the parallelism.
+    `fn` must be a module-level function so workers can import it.
+    """
+    count = len(args[0]) if args else 0
+    if count < settings.CHUNK_PROCESS_MIN_DOCS:
+        return list(map(fn, *args))
+    chunksize = max(1, count // (settings.CHUNK_PROCESS_WORKERS * 4))
+    return list(get_process_pool().map(fn, *args, chunksize=chunksize))
+
+
+def _split_document(splitter, document: Document) -> list[Document]:
+    return splitter.split_documents([document])
+
+
+def split_documents(splitter, documents: list[Document]) -> list[Document]:
+    """
+    `splitter.split_documents(documents)`, one file per worker task.
+
+    The splitter is pickled with each batch of files sent to a worker, so
+    it must be picklable (LangChain's text splitters are).
+    """
+    split = parallel_map(functools.partial(_split_document, splitter), documents)
+    return [chunk for chunks in split for chunk in chunks]
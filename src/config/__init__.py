@@ -1 +1,2 @@
 from .settings import settings
+from .log import setup_logging
@@ -26,9 +26,29 @@ class Settings:
     LLM_MODEL: str = "qwen/qwen3-32b"
     LLM_TEMPERATURE: float = 0
     LLM_MAX_RETRIES: int = 2
+    # Process-wide LLM response cache (disable for eval runs with LLM_CACHE=false)
+    LLM_CACHE: bool = os.getenv("LLM_CACHE", "true").lower() == "true"
+    LLM_CACHE_SIZE: int = 1024  # responses kept; the oldest is evicted first
 
     # Embeddings Configuration
     EMBEDDING_MODEL: str = "sentence-transformers/all-mpnet-base-v2"
+    EMBED_BATCH_SIZE: int = 128  # chunks per embedding/upsert request
+    EMBED_CONCURRENCY: int = 8   # batches in flight at once
+    INDEX_CHECK_BATCH_SIZE: int = 64  # files per "already indexed?" lookup
+    # Embed through an Infinity/OpenAI-compatible server instead of in-process
+    EMBED_SERVER_URL: str = os.getenv("EMBED_SERVER_URL", "")
+    # In-process backend: "huggingface" (torch) or "fastembed" (ONNX Runtime,
+    # requires `fastembed` and `langchain-community`)
+    EMBEDDING_BACKEND: str = os.getenv("EMBEDDING_BACKEND", "huggingface")
+    # Weight dtype for the huggingface backend, e.g. "bfloat16" on CPUs with
+    # AMX/AVX-512-BF16 or Ampere+ GPUs
+    EMBEDDING_DTYPE: str = os.getenv("EMBEDDING_DTYPE", "float32")
+
+    # Distributed embedding with Ray for large uploads (requires `ray`)
+    USE_RAY: bool = False
+    RAY_EMBED_WORKERS: int = 4
+    RAY_GPUS_PER_WORKER: float = 0
+    RAY_MIN_FILES: int = 500  # smaller uploads skip Ray's startup cost
     
     CHUNKER_NAME: str = "context"
 
@@ -36,9 +56,16 @@ class Settings:
     # Options: "function" (P1), "ast" (P2), "context" (P3), "graph" (P4)
     CHUNKING_STRATEGY: str = "function"
     
+    # Use tree-sitter for P1 function splitting (requires `tree-sitter-python`)
+    USE_TREE_SITTER: bool = os.getenv("USE_TREE_SITTER", "false").lower() == "true"
+    
     # Retrieval Mode: "vector" (P1-P3) or "graph" (P4)
     RETRIEVAL_MODE: str = "vector"
 
+    # Parse files in worker processes when a batch has at least this many misses
+    CHUNK_PROCESS_MIN_DOCS: int = 8
+    CHUNK_PROCESS_WORKERS: int = os.cpu_count() or 1
+
     # Recursive chunker settings
     CHUNK_SIZE: int = 1000
     CHUNK_OVERLAP: int = 200
@@ -48,23 +75,36 @@ class Settings:
 
     # Retrieval Configuration
     RETRIEVAL_K: int = 2
+    QUERY_WORKERS: int = 8  # threads running blocking agent/retrieval calls
+
+    # Cache Configuration
+    SEMANTIC_CACHE_THRESHOLD: float = 0.97
+
+    # Upload limits (uncompressed bytes) to guard against zip bombs
+    ZIP_MAX_ENTRY_BYTES: int = 5 * 1024 * 1024
+    ZIP_MAX_TOTAL_BYTES: int = 200 * 1024 * 1024
+    ZIP_READ_WORKERS: int = min(16, (os.cpu_count() or 1) * 2)  # parallel entry reads
 
     # Storage Configuration
     BASE_DIR: Path = Path(__file__).parent.parent.parent
     DATA_DIR: Path = BASE_DIR / "data"
     VECTOR_DB_DIR: str = str(BASE_DIR / "chroma_db")
     KUZU_DB_DIR: str = str(BASE_DIR / "kuzu_db")
+    KUZU_BUFFER_POOL_BYTES: int = 0  # 0 = Kùzu default (80% of RAM)
+    KUZU_QUERY_THREADS: int = 0  # threads per connection's query; 0 = all cores
+    EMBED_CACHE_DIR: str = str(BASE_DIR / "embedding_cache")
 
-    def __init__(self):
-        # Set environment variables for LangChain/LangSmith
-        os.environ["GROQ_API_KEY"] = self.GROQ_API_KEY
-        os.environ["LANGSMITH_API_KEY"] = self.LANGSMITH_API_KEY
-        os.environ["LANGSMITH_TRACING"] = self.LANGSMITH_TRACING
-        
-        os.environ["ASTRA_DB_APPLICATION_TOKEN"] = self.ASTRA_DB_APPLICATION_TOKEN
-        os.environ["ASTRA_DB_API_ENDPOINT"] = self.ASTRA_DB_API_ENDPOINT
-        
 
+def _export_env(config: Settings) -> None:
+    """Expose API credentials to LangChain/LangSmith through the environment."""
+    os.environ.update({
+        "GROQ_API_KEY": config.GROQ_API_KEY,
+        "LANGSMITH_API_KEY": config.LANGSMITH_API_KEY,
+        "LANGSMITH_TRACING": config.LANGSMITH_TRACING,
+        "ASTRA_DB_APPLICATION_TOKEN": config.ASTRA_DB_APPLICATION_TOKEN,
+        "ASTRA_DB_API_ENDPOINT": config.ASTRA_DB_API_ENDPOINT,
+    })
 
 
-settings = Settings()
\ No newline at end of file
+settings = Settings()
+_export_env(settings)
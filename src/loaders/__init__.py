@@ -1 +1 @@
-from .python_files import load_python_files
+from .python_files import load_python_files, aload_python_files, content_hash
@@ -1,37 +1,122 @@
 """Load Python files from local filesystem."""
 
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import mmap
+import os
 from pathlib import Path
+from typing import Iterator
 from langchain_core.documents import Document
 
 
+def _iter_py(root: str) -> Iterator[str]:
+    """
+    Yield the paths of all .py files under root.
+
+    Walks with os.scandir, whose entries carry their type from the directory
+    listing, so non-Python files are skipped without a stat or a Path object.
+    """
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.endswith(".py"):
+                    yield entry.path
+
+
+def _collect_python_files(paths: list[str | Path]) -> list[str]:
+    """Expand file and directory paths into the list of .py files to load."""
+    files = []
+
+    for path in paths:
+        path = os.fspath(path)
+
+        if os.path.isfile(path) and path.endswith(".py"):
+            files.append(path)
+        elif os.path.isdir(path):
+            # Load all .py files in directory
+            files.extend(_iter_py(path))
+
+    return files
+
+
+# Files at least this large are decoded straight from a memory map
+MMAP_MIN_BYTES = 64 * 1024
+
+
+def _read_source(path: str | Path) -> str:
+    """
+    Read a UTF-8 source file with universal newlines, like `Path.read_text`.
+
+    Large files are decoded directly from a read-only memory map of the
+    page cache, skipping the intermediate bytes copy of a regular read.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size >= MMAP_MIN_BYTES:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                # Decoded front to back once, so let the kernel read ahead
+                if hasattr(mmap, "MADV_SEQUENTIAL"):
+                    mm.madvise(mmap.MADV_SEQUENTIAL)
+                text = str(mm, "utf-8")
+        else:
+            text = f.read().decode("utf-8")
+
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+
+def content_hash(content: str) -> str:
+    """Short digest of file content, used to skip re-indexing unchanged files."""
+    return hashlib.blake2b(content.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _to_document(path: str | Path, content: str) -> Document:
+    return Document(
+        page_content=content,
+        metadata={
+            "source": str(path),
+            "file_type": "python",
+            "content_hash": content_hash(content),
+        }
+    )
+
+
 def load_python_files(paths: list[str | Path]) -> list[Document]:
     """
     Load Python files from local paths.
-    
+
     Args:
         paths: List of file paths or directory paths
-        
+
     Returns:
         List of Document objects with source metadata
     """
-    documents = []
-    
-    for path in paths:
-        path = Path(path)
-        
-        if path.is_file() and path.suffix == ".py":
-            content = path.read_text(encoding="utf-8")
-            documents.append(Document(
-                page_content=content,
-                metadata={"source": str(path), "file_type": "python"}
-            ))
-        elif path.is_dir():
-            # Load all .py files in directory
-            for py_file in path.glob("**/*.py"):
-                content = py_file.read_text(encoding="utf-8")
-                documents.append(Document(
-                    page_content=content,
-                    metadata={"source": str(py_file), "file_type": "python"}
-                ))
-    
-    return documents
+    files = _collect_python_files(paths)
+    # Reads release the GIL, so threads overlap them
+    with ThreadPoolExecutor(max_workers=min(32, len(files) or 1)) as pool:
+        contents = list(pool.map(_read_source, files))
+    return [_to_document(py_file, content) for py_file, content in zip(files, contents)]
+
+
+async def aload_python_files(paths: list[str | Path]) -> list[Document]:
+    """
+    Load Python files concurrently without blocking the event loop.
+
+    Same behaviour as `load_python_files`, but every file is read in a
+    worker thread so disk reads overlap with each other.
+
+    Args:
+        paths: List of file paths or directory paths
+
+    Returns:
+        List of Document objects with source metadata
+    """
+    files = await asyncio.to_thread(_collect_python_files, paths)
+    contents = await asyncio.gather(
+        *(asyncio.to_thread(_read_source, py_file) for py_file in files)
+    )
+    return [_to_document(py_file, content) for py_file, content in zip(files, contents)]
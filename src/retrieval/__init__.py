@@ -1,4 +1,4 @@
-from .pipeline import RetrievalPipeline
+from .pipeline import RetrievalPipeline, build_collection_name, get_shared_embeddings
 from .graph_store import CodeKnowledgeGraph
 
-__all__ = ["RetrievalPipeline", "CodeKnowledgeGraph"]
+__all__ = ["RetrievalPipeline", "CodeKnowledgeGraph", "build_collection_name", "get_shared_embeddings"]
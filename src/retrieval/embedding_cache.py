@@ -0,0 +1,119 @@
+"""Disk-backed embedding cache keyed by chunk content hash."""
+
+import asyncio
+import hashlib
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an embedding model and persists document embeddings to disk.
+
+    Each vector is stored as raw float32 bytes in its own file, named by
+    ``sha256(model_name + text)``, so unchanged chunks are never re-embedded
+    and switching the embedding model naturally invalidates the cache.
+
+    Args:
+        underlying: Embedding model used on cache misses.
+        cache_dir: Directory where vectors are stored (created if missing).
+        model_name: Identifier of the underlying model, mixed into every key.
+    """
+
+    def __init__(self, underlying: Embeddings, cache_dir: str | Path, model_name: str):
+        self.underlying = underlying
+        self.cache_dir = Path(cache_dir)
+        self.model_name = model_name
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256((self.model_name + text).encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / key
+
+    def _load(self, key: str) -> list[float] | None:
+        try:
+            data = self._path(key).read_bytes()
+        except FileNotFoundError:
+            return None
+        return np.frombuffer(data, dtype=np.float32).tolist()
+
+    def _store(self, key: str, vector: list[float]) -> None:
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        # Write then rename so concurrent readers never see a partial vector
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(np.asarray(vector, dtype=np.float32).tobytes())
+        os.replace(tmp_path, path)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """Embed documents, only calling the model for uncached texts."""
+        keys = [self._key(text) for text in texts]
+        vectors = [self._load(key) for key in keys]
+
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        with self._stats_lock:
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+        if missing:
+            fresh = self.underlying.embed_documents([texts[i] for i in missing])
+            for i, vector in zip(missing, fresh):
+                self._store(keys[i], vector)
+                vectors[i] = vector
+
+        return vectors
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        """
+        Async version of `embed_documents`.
+
+        Misses go through the model's own `aembed_documents`, so clients
+        with a concurrent async path (e.g. `InfinityEmbeddings`) keep it;
+        cache file reads and writes run on a thread.
+        """
+        keys = [self._key(text) for text in texts]
+        vectors = await asyncio.to_thread(lambda: [self._load(key) for key in keys])
+
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        with self._stats_lock:
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+        if missing:
+            fresh = await self.underlying.aembed_documents([texts[i] for i in missing])
+            await asyncio.to_thread(self.prime, [texts[i] for i in missing], fresh)
+            for i, vector in zip(missing, fresh):
+                vectors[i] = vector
+
+        return vectors
+
+    def stats(self) -> dict[str, float]:
+        """Return hit/miss counters and the hit rate since startup."""
+        with self._stats_lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else 0.0,
+        }
+
+    def prime(self, texts: list[str], vectors: list[list[float]]) -> None:
+        """Store embeddings computed elsewhere so later lookups hit the cache."""
+        for text, vector in zip(texts, vectors):
+            self._store(self._key(text), vector)
+
+    def embed_query(self, text: str) -> list[float]:
+        """Embed a query; queries are not cached."""
+        return self.underlying.embed_query(text)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        """Async version of `embed_query`."""
+        return await self.underlying.aembed_query(text)
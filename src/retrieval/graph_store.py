@@ -1,9 +1,130 @@
 """Code Knowledge Graph using Kùzu embedded graph database."""
 
+from collections import OrderedDict
+import functools
+import itertools
+import threading
+import warnings
 from typing import List
 import kuzu
 from langchain_core.documents import Document
 
+from src.config import settings
+
+# GraphChunker metadata key -> relationship table it populates
+_RELATIONSHIPS = (
+    ("calls", "CALLS"),
+    ("inherits_from", "INHERITS_FROM"),
+    ("contains_methods", "CONTAINS"),
+    ("imports", "IMPORTS"),
+)
+
+# Rows per UNWIND write query, bounding the size of each parameter list
+_WRITE_BATCH_SIZE = 1000
+
+# Cached traversals per database path
+_QUERY_CACHE_SIZE = 1024
+
+# Deepest CALLS traversal; bounds the per-depth queries and prepared statements
+_MAX_TRAVERSAL_DEPTH = 5
+
+# Read queries, prepared once per connection
+_ENTITY_COLUMNS = """
+           called.name AS name,
+           called.entity_type AS entity_type,
+           called.source AS source,
+           called.start_line AS start_line,
+           called.end_line AS end_line,
+           called.content AS content"""
+
+
+@functools.cache
+def _call_chain_query(max_depth: int) -> str:
+    """
+    Query for the entities reachable from $name over at most max_depth CALLS.
+    
+    SHORTEST visits each reachable entity once instead of expanding every
+    path to it, which explodes on diamond-shaped call graphs. Its lower
+    bound must be 1, so the start entity is added by a UNION. Kùzu cannot
+    parameterize path bounds, so there is one query per depth.
+    """
+    query = f"""
+    MATCH (called:Entity {{name: $name}})
+    WHERE called.content IS NOT NULL
+    RETURN {_ENTITY_COLUMNS}
+    """
+    if max_depth >= 1:
+        query += f"""
+    UNION
+    MATCH (start:Entity {{name: $name}})-[:CALLS* SHORTEST 1..{max_depth}]->(called:Entity)
+    WHERE called.content IS NOT NULL
+    RETURN {_ENTITY_COLUMNS}
+    """
+    return query
+
+
+@functools.cache
+def _hybrid_query(max_depth: int) -> str:
+    """
+    Query for the entities reachable from $names over at most max_depth CALLS.
+    
+    Like `_call_chain_query`, for several start names at once. Rows carry
+    the 1-based position of the first name that reaches them as rank.
+    """
+    query = f"""
+    UNWIND range(1, size($names)) AS i
+    MATCH (called:Entity {{name: $names[i]}})
+    WHERE called.content IS NOT NULL
+    RETURN {_ENTITY_COLUMNS},
+           i AS rank
+    """
+    if max_depth >= 1:
+        query += f"""
+    UNION ALL
+    UNWIND range(1, size($names)) AS i
+    MATCH (start:Entity {{name: $names[i]}})-[:CALLS* SHORTEST 1..{max_depth}]->(called:Entity)
+    WHERE called.content IS NOT NULL
+    RETURN {_ENTITY_COLUMNS},
+           min(i) AS rank
+    """
+    return query
+
+
+_CALLERS_QUERY = """
+    MATCH (caller:Entity)-[:CALLS]->(target:Entity {name: $name})
+    WHERE caller.content IS NOT NULL
+    RETURN caller.name AS name,
+           caller.entity_type AS entity_type,
+           caller.source AS source,
+           caller.start_line AS start_line,
+           caller.end_line AS end_line,
+           caller.content AS content
+"""
+
+@functools.cache
+def _class_with_methods_query(fetch_content: bool) -> str:
+    """
+    Query for the class $name and its methods.
+    
+    Without content the content column is an empty string, so callers that
+    only list methods do not pull every method body out of the database.
+    """
+    content = "entity.content" if fetch_content else "''"
+    return f"""
+    MATCH (c:Entity {{name: $name}})
+    WHERE c.content IS NOT NULL
+    OPTIONAL MATCH (c)-[:CONTAINS]->(m:Entity)
+    WHERE m.content IS NOT NULL
+    WITH c, collect(m) AS methods
+    UNWIND [c] + methods AS entity
+    RETURN DISTINCT entity.name AS name,
+           entity.entity_type AS entity_type,
+           entity.source AS source,
+           entity.start_line AS start_line,
+           entity.end_line AS end_line,
+           {content} AS content
+    """
+
 
 class CodeKnowledgeGraph:
     """Kùzu-backed Code Knowledge Graph for GraphRAG.
@@ -13,6 +134,15 @@ class CodeKnowledgeGraph:
     
     # Singleton storage for Database instances to prevent file locking issues
     _db_instances = {}
+    _db_lock = threading.Lock()
+    
+    # Traversal result rows per database path, shared by every instance on
+    # that path so a write through one instance invalidates them for all
+    _query_caches: dict[str, OrderedDict[tuple, list[list]]] = {}
+    _cache_lock = threading.Lock()
+    
+    # Connections per thread and database path, reused by every instance
+    _thread_state = threading.local()
 
     def __init__(self, db_path: str):
         """Initialize with path to Kùzu database folder.
@@ -20,14 +150,52 @@ class CodeKnowledgeGraph:
         Args:
             db_path: Path to folder where Kùzu stores data (created if not exists)
         """
-        # Ensure only one Database object exists per path to prevent locking errors
-        if db_path not in self._db_instances:
-            self._db_instances[db_path] = kuzu.Database(db_path)
+        # Ensure only one Database object exists per path to prevent locking
+        # errors, even when pipelines are created from several threads at once
+        with self._db_lock:
+            if db_path not in self._db_instances:
+                self._db_instances[db_path] = kuzu.Database(
+                    db_path, buffer_pool_size=settings.KUZU_BUFFER_POOL_BYTES
+                )
             
         self.db = self._db_instances[db_path]
-        self.conn = kuzu.Connection(self.db)
+        self.db_path = db_path
+        with self._cache_lock:
+            self._query_cache = self._query_caches.setdefault(db_path, OrderedDict())
         self._ensure_schema()
     
+    @property
+    def conn(self) -> kuzu.Connection:
+        """This thread's connection to the database.
+        
+        Connections are not shared between threads, so each thread opens one
+        per database path on first use and keeps it for later instances.
+        """
+        connections = getattr(self._thread_state, "connections", None)
+        if connections is None:
+            connections = self._thread_state.connections = {}
+        conn = connections.get(self.db_path)
+        if conn is None:
+            conn = connections[self.db_path] = kuzu.Connection(
+                self.db, num_threads=settings.KUZU_QUERY_THREADS
+            )
+        return conn
+    
+    def _prepared(self, query: str):
+        """This thread's prepared statement for a read query, planned on first use."""
+        statements = getattr(self._thread_state, "statements", None)
+        if statements is None:
+            statements = self._thread_state.statements = {}
+        key = (self.db_path, query)
+        statement = statements.get(key)
+        if statement is None:
+            # Kùzu 0.11 deprecates prepare() in favour of execute(query, params),
+            # but that re-parses and re-plans the query on every call
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", DeprecationWarning)
+                statement = statements[key] = self.conn.prepare(query)
+        return statement
+    
     def _ensure_schema(self):
         """Create node and relationship tables if they don't exist."""
         # Create Entity node table
@@ -47,7 +215,7 @@ class CodeKnowledgeGraph:
             pass  # Table already exists
         
         # Create relationship tables
-        for rel in ["CALLS", "INHERITS_FROM", "CONTAINS", "IMPORTS"]:
+        for _, rel in _RELATIONSHIPS:
             try:
                 self.conn.execute(f"CREATE REL TABLE {rel} (FROM Entity TO Entity)")
             except RuntimeError:
@@ -61,145 +229,194 @@ class CodeKnowledgeGraph:
     def clear(self):
         """Clear all nodes and relationships."""
         self.conn.execute("MATCH (n) DETACH DELETE n")
+        self._clear_cache()
     
     def add_entities(self, documents: List[Document]):
-        """Build graph from GraphChunker output."""
+        """Build graph from GraphChunker output.
+        
+        Entity nodes are upserted with UNWIND queries, then the edges with
+        UNWIND queries per relationship type, all in one transaction. Each
+        query carries at most _WRITE_BATCH_SIZE rows.
+        """
+        entities: dict[str, dict] = {}
+        edges: dict[str, set[tuple[str, str]]] = {rel: set() for _, rel in _RELATIONSHIPS}
         for doc in documents:
             meta = doc.metadata
             name = meta.get("name")
             if not name:
                 continue
+            # Later documents win, as with one MERGE per document
+            entities[name] = {
+                "name": name,
+                "entity_type": meta.get("entity_type", "unknown"),
+                "source": meta.get("source", ""),
+                "start_line": meta.get("start_line") or 0,
+                "end_line": meta.get("end_line") or 0,
+                "content": doc.page_content,
+            }
+            for key, rel in _RELATIONSHIPS:
+                edges[rel].update((name, target) for target in meta.get(key, ()))
+        if not entities:
+            return
+        
+        self.conn.execute("BEGIN TRANSACTION")
+        try:
+            # Create entity nodes using MERGE
+            for rows in itertools.batched(entities.values(), _WRITE_BATCH_SIZE):
+                self.conn.execute(
+                    """
+                    UNWIND $rows AS r
+                    MERGE (e:Entity {name: r.name})
+                    SET e.entity_type = r.entity_type,
+                        e.source = r.source,
+                        e.start_line = r.start_line,
+                        e.end_line = r.end_line,
+                        e.content = r.content
+                    """,
+                    {"rows": list(rows)}
+                )
             
-            # Create entity node using MERGE
-            self.conn.execute(
-                """
-                MERGE (e:Entity {name: $name})
-                SET e.entity_type = $entity_type,
-                    e.source = $source,
-                    e.start_line = $start_line,
-                    e.end_line = $end_line,
-                    e.content = $content
-                """,
-                {
-                    "name": name,
-                    "entity_type": meta.get("entity_type", "unknown"),
-                    "source": meta.get("source", ""),
-                    "start_line": meta.get("start_line") or 0,
-                    "end_line": meta.get("end_line") or 0,
-                    "content": doc.page_content,
-                }
-            )
-            
-            # Create CALLS relationships
-            for called in meta.get("calls", []):
-                self._create_relationship(name, called, "CALLS")
-            
-            # Create INHERITS_FROM relationships
-            for base in meta.get("inherits_from", []):
-                self._create_relationship(name, base, "INHERITS_FROM")
-            
-            # Create CONTAINS relationships
-            for method in meta.get("contains_methods", []):
-                self._create_relationship(name, method, "CONTAINS")
-                
-            # Create IMPORTS relationships
-            for imported in meta.get("imports", []):
-                self._create_relationship(name, imported, "IMPORTS")
-    
-    def _create_relationship(self, from_name: str, to_name: str, rel_type: str):
-        """Create a relationship between two entities."""
-        self.conn.execute(
-            f"""
-            MERGE (a:Entity {{name: $from_name}})
-            MERGE (b:Entity {{name: $to_name}})
-            MERGE (a)-[:{rel_type}]->(b)
-            """,
-            {"from_name": from_name, "to_name": to_name}
-        )
+            # Source nodes were just upserted, so only targets need a MERGE
+            for rel, pairs in edges.items():
+                for batch in itertools.batched(pairs, _WRITE_BATCH_SIZE):
+                    self.conn.execute(
+                        f"""
+                        UNWIND $edges AS e
+                        MATCH (a:Entity {{name: e.f}})
+                        MERGE (b:Entity {{name: e.t}})
+                        MERGE (a)-[:{rel}]->(b)
+                        """,
+                        {"edges": [{"f": f, "t": t} for f, t in batch]}
+                    )
+        except Exception:
+            # Kùzu already rolls back on some failures (e.g. binder errors)
+            try:
+                self.conn.execute("ROLLBACK")
+            except RuntimeError:
+                pass
+            raise
+        self.conn.execute("COMMIT")
+        self._clear_cache()
     
     def get_call_chain(self, start_name: str, max_depth: int = 3) -> List[Document]:
-        """Traverse CALLS relationships using Cypher."""
-        result = self.conn.execute(
-            f"""
-            MATCH (start:Entity {{name: $name}})-[:CALLS*0..{max_depth}]->(called:Entity)
-            WHERE called.content IS NOT NULL
-            RETURN DISTINCT called.name AS name,
-                   called.entity_type AS entity_type,
-                   called.source AS source,
-                   called.start_line AS start_line,
-                   called.end_line AS end_line,
-                   called.content AS content
-            """,
-            {"name": start_name}
+        """Traverse CALLS relationships using Cypher.
+        
+        max_depth is capped at _MAX_TRAVERSAL_DEPTH. Results are cached
+        until the graph is next written.
+        """
+        max_depth = min(max_depth, _MAX_TRAVERSAL_DEPTH)
+        return self._cached(
+            ("call_chain", start_name, max_depth),
+            lambda: self.conn.execute(
+                self._prepared(_call_chain_query(max_depth)),
+                {"name": start_name}
+            ).get_all()
         )
-        return self._results_to_documents(result)
     
     def get_callers(self, entity_name: str) -> List[Document]:
-        """Find what calls this entity."""
-        result = self.conn.execute(
-            """
-            MATCH (caller:Entity)-[:CALLS]->(target:Entity {name: $name})
-            WHERE caller.content IS NOT NULL
-            RETURN caller.name AS name,
-                   caller.entity_type AS entity_type,
-                   caller.source AS source,
-                   caller.start_line AS start_line,
-                   caller.end_line AS end_line,
-                   caller.content AS content
-            """,
-            {"name": entity_name}
+        """Find what calls this entity (cached like `get_call_chain`)."""
+        return self._cached(
+            ("callers", entity_name),
+            lambda: self.conn.execute(
+                self._prepared(_CALLERS_QUERY),
+                {"name": entity_name}
+            ).get_all()
         )
-        return self._results_to_documents(result)
     
-    def get_class_with_methods(self, class_name: str) -> List[Document]:
-        """Get a class and all its methods."""
+    def get_class_with_methods(self, class_name: str, fetch_content: bool = True) -> List[Document]:
+        """Get a class and all its methods.
+        
+        With fetch_content=False the Documents have empty page_content and
+        only their metadata (name, type, source, line range) is read.
+        """
         result = self.conn.execute(
-            """
-            MATCH (c:Entity {name: $name})
-            WHERE c.content IS NOT NULL
-            OPTIONAL MATCH (c)-[:CONTAINS]->(m:Entity)
-            WHERE m.content IS NOT NULL
-            WITH c, collect(m) AS methods
-            UNWIND [c] + methods AS entity
-            RETURN DISTINCT entity.name AS name,
-                   entity.entity_type AS entity_type,
-                   entity.source AS source,
-                   entity.start_line AS start_line,
-                   entity.end_line AS end_line,
-                   entity.content AS content
-            """,
+            self._prepared(_class_with_methods_query(fetch_content)),
             {"name": class_name}
         )
         return self._results_to_documents(result)
     
+    def get_class_methods_meta(self, class_name: str) -> List[dict]:
+        """Get the metadata of a class and its methods, without their content."""
+        return [doc.metadata for doc in self.get_class_with_methods(class_name, fetch_content=False)]
+    
     def hybrid_search(self, entity_names: List[str], max_depth: int = 2) -> List[Document]:
-        """Expand vector search results with graph context."""
-        all_docs = []
-        seen = set()
+        """Expand vector search results with graph context.
         
-        for name in entity_names:
-            docs = self.get_call_chain(name, max_depth)
-            for doc in docs:
-                doc_name = doc.metadata.get("name")
-                if doc_name not in seen:
-                    all_docs.append(doc)
-                    seen.add(doc_name)
+        All call chains are traversed in one query, keeping entities reached
+        from earlier names first. Depth is capped and results are cached like
+        `get_call_chain`.
+        """
+        names = list(dict.fromkeys(entity_names))
+        if not names:
+            return []
+        max_depth = min(max_depth, _MAX_TRAVERSAL_DEPTH)
+        return self._cached(
+            ("hybrid", tuple(names), max_depth),
+            lambda: self._hybrid_rows(names, max_depth)
+        )
+    
+    def _hybrid_rows(self, names: List[str], max_depth: int) -> list[list]:
+        result = self.conn.execute(
+            self._prepared(_hybrid_query(max_depth)),
+            {"names": names}
+        )
+        # A start entity can also be reached from another name; keep its
+        # lowest rank. The sort is stable, so start rows stay ahead.
+        rows = result.get_all()
+        rows.sort(key=lambda row: row[6])
+        seen = set()
+        add = seen.add
+        # Compact in place rather than building a second list
+        kept = 0
+        for row in rows:
+            name = row[0]
+            if name not in seen:
+                add(name)
+                rows[kept] = row
+                kept += 1
+        del rows[kept:]
+        return rows
+    
+    def _cached(self, key: tuple, fetch) -> List[Document]:
+        """
+        Documents for a traversal, running fetch() for its rows on a miss.
         
-        return all_docs
+        The per-path LRU keeps the raw rows and fresh Documents are built
+        on every call, so callers can never modify a cached result.
+        """
+        with self._cache_lock:
+            rows = self._query_cache.get(key)
+            if rows is not None:
+                self._query_cache.move_to_end(key)
+        if rows is None:
+            rows = fetch()
+            with self._cache_lock:
+                self._query_cache[key] = rows
+                while len(self._query_cache) > _QUERY_CACHE_SIZE:
+                    self._query_cache.popitem(last=False)
+        return [_row_to_document(row) for row in rows]
+    
+    def _clear_cache(self) -> None:
+        with self._cache_lock:
+            self._query_cache.clear()
     
     def _results_to_documents(self, result) -> List[Document]:
         """Convert Kùzu query result to LangChain Documents."""
         docs = []
         while result.has_next():
-            row = result.get_next()
-            docs.append(Document(
-                page_content=row[5] or "",  # content
-                metadata={
-                    "name": row[0],
-                    "entity_type": row[1],
-                    "source": row[2],
-                    "start_line": row[3],
-                    "end_line": row[4],
-                }
-            ))
-        return docs
\ No newline at end of file
+            docs.append(_row_to_document(result.get_next()))
+        return docs
+
+
+def _row_to_document(row: list) -> Document:
+    """Build a Document from a (name, entity_type, source, start_line, end_line, content) row."""
+    return Document(
+        page_content=row[5] or "",  # content
+        metadata={
+            "name": row[0],
+            "entity_type": row[1],
+            "source": row[2],
+            "start_line": row[3],
+            "end_line": row[4],
+        }
+    )
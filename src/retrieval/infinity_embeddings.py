@@ -0,0 +1,79 @@
+"""Embeddings served over HTTP by an Infinity (or other OpenAI-compatible) server.
+
+The server batches requests from every client onto the model, so the API
+process never loads sentence-transformers itself. Used when
+EMBED_SERVER_URL is set.
+"""
+
+import asyncio
+import weakref
+
+from langchain_core.embeddings import Embeddings
+
+from src.config import settings
+
+
+class InfinityEmbeddings(Embeddings):
+    """
+    Client for an OpenAI-compatible `/embeddings` endpoint.
+
+    Texts are sent in batches of EMBED_BATCH_SIZE over pooled connections;
+    the async variants send all batches concurrently. Async clients are
+    created per event loop, since pooled connections are bound to the loop
+    that opened them (`RetrievalPipeline.index_documents` runs a fresh loop
+    on every call).
+
+    Args:
+        base_url: Server URL, e.g. "http://embed-server:7997".
+        model_name: Model the server should use.
+        max_connections: Size of the HTTP connection pool.
+    """
+
+    def __init__(self, base_url: str, model_name: str, max_connections: int = 32):
+        import httpx
+
+        self.url = base_url.rstrip("/") + "/embeddings"
+        self.model_name = model_name
+        self._limits = httpx.Limits(max_connections=max_connections)
+        self._client = httpx.Client(limits=self._limits, timeout=60)
+        self._async_clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+    def _async_client(self):
+        """Return the async client for the running event loop, creating it on first use."""
+        import httpx
+
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = self._async_clients[loop] = httpx.AsyncClient(limits=self._limits, timeout=60)
+        return client
+
+    def _batches(self, texts: list[str]) -> list[list[str]]:
+        size = settings.EMBED_BATCH_SIZE
+        return [texts[i:i + size] for i in range(0, len(texts), size)]
+
+    def _parse(self, response) -> list[list[float]]:
+        response.raise_for_status()
+        data = sorted(response.json()["data"], key=lambda item: item["index"])
+        return [item["embedding"] for item in data]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        vectors = []
+        for batch in self._batches(texts):
+            response = self._client.post(self.url, json={"model": self.model_name, "input": batch})
+            vectors.extend(self._parse(response))
+        return vectors
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        client = self._async_client()
+        responses = await asyncio.gather(*(
+            client.post(self.url, json={"model": self.model_name, "input": batch})
+            for batch in self._batches(texts)
+        ))
+        return [vector for response in responses for vector in self._parse(response)]
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return (await self.aembed_documents([text]))[0]
@@ -2,13 +2,128 @@
 Retrieval pipeline: embeddings, vector store, and retrieval tool.
 """
 
-from langchain_huggingface import HuggingFaceEmbeddings
+import asyncio
+import functools
+import hashlib
+import logging
+import os
+import re
+
 from langchain_astradb import AstraDBVectorStore
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 from langchain.tools import tool
 
 from src.config import settings
 from src.chunking import get_chunker, BaseChunker
+from src.retrieval.embedding_cache import CachedEmbeddings
+
+logger = logging.getLogger(__name__)
+
+# Collection name parts: the LLM model slug and the source_dir sanitizer
+MODEL_SLUG = settings.LLM_MODEL.rsplit("/", 1)[-1].translate(str.maketrans("-.", "__"))
+_SANITIZE = re.compile(r"[^A-Za-z0-9]")
+
+# Metadata set on a file's first chunk once all of its chunks are stored
+INDEXED_FIELD = "indexed_hash"
+
+
+def build_embeddings() -> tuple[Embeddings, str]:
+    """
+    Build the configured embedding model and the name its vectors are cached under.
+    
+    With EMBED_SERVER_URL set, the model runs on that server; otherwise
+    EMBEDDING_BACKEND and EMBEDDING_DTYPE pick the in-process model. Ray
+    workers build theirs here too, so vectors they prime the cache with
+    match the model named in the cache key.
+    """
+    model_name = settings.EMBEDDING_MODEL
+    if settings.EMBED_SERVER_URL:
+        from src.retrieval.infinity_embeddings import InfinityEmbeddings
+        return InfinityEmbeddings(settings.EMBED_SERVER_URL, settings.EMBEDDING_MODEL), model_name
+    if settings.EMBEDDING_BACKEND == "fastembed":
+        from langchain_community.embeddings.fastembed import FastEmbedEmbeddings
+        underlying = FastEmbedEmbeddings(
+            model_name=settings.EMBEDDING_MODEL,
+            batch_size=settings.EMBED_BATCH_SIZE,
+            threads=os.cpu_count(),
+        )
+        # Quantized ONNX vectors differ slightly; keep them in their own cache
+        return underlying, f"fastembed:{model_name}"
+    from langchain_huggingface import HuggingFaceEmbeddings
+    model_kwargs = {}
+    if settings.EMBEDDING_DTYPE != "float32":
+        # sentence-transformers returns float32 vectors from any dtype
+        model_kwargs["model_kwargs"] = {"torch_dtype": settings.EMBEDDING_DTYPE}
+        model_name = f"{settings.EMBEDDING_DTYPE}:{model_name}"
+    underlying = HuggingFaceEmbeddings(
+        model_name=settings.EMBEDDING_MODEL, model_kwargs=model_kwargs
+    )
+    return underlying, model_name
+
+
+@functools.cache
+def get_shared_embeddings() -> CachedEmbeddings:
+    """
+    Return the process-wide cached embedding model.
+    
+    Every pipeline shares it, so the model is loaded once and a chunk that
+    appears under several chunking strategies is only embedded once.
+    """
+    underlying, model_name = build_embeddings()
+    return CachedEmbeddings(
+        underlying,
+        cache_dir=settings.EMBED_CACHE_DIR,
+        model_name=model_name,
+    )
+
+
+def _with_stable_ids(chunks: list[Document]) -> tuple[list[Document], list[str]]:
+    """
+    Derive a stable ID for each chunk from its source, position and content.
+    
+    Re-indexing an unchanged file then overwrites the existing entries
+    instead of adding duplicates. The position (``start_line``, or
+    ``start_index`` for character splitters) keeps identical chunks at
+    different places in one file apart; only true repeats are dropped.
+    """
+    unique: dict[str, Document] = {}
+    for chunk in chunks:
+        metadata = chunk.metadata
+        position = metadata.get("start_line", metadata.get("start_index", ""))
+        key = f"{metadata.get('source', '')}\0{position}\0{chunk.page_content}"
+        unique.setdefault(hashlib.sha256(key.encode("utf-8")).hexdigest(), chunk)
+    return list(unique.values()), list(unique.keys())
+
+
+def _index_key(metadata: dict) -> tuple[str, str] | None:
+    """(source, content_hash) identifying one version of a file, if hashed."""
+    content_hash = metadata.get("content_hash")
+    return (metadata.get("source", ""), content_hash) if content_hash else None
+
+
+def _index_filter(key: tuple[str, str]) -> dict:
+    return {"source": key[0], INDEXED_FIELD: key[1]}
+
+
+def build_collection_name(chunker_name: str, source_dir: str | None = None) -> str:
+    """Collection name for a source dir, chunking strategy and the LLM model."""
+    if source_dir:
+        # Sanitize source_dir: replace non-alphanumeric with underscore
+        safe_source = _SANITIZE.sub("_", source_dir)
+        collection_name = f"{safe_source}_{chunker_name}_{MODEL_SLUG}"
+    else:
+        collection_name = f"{chunker_name}_{MODEL_SLUG}"
+    return collection_name[:48]
+
+
+def _source_line(metadata: dict) -> str:
+    """Short "source=... lines=a-b" label for a retrieved chunk."""
+    source = f"source={metadata.get('source')}"
+    start_line = metadata.get("start_line")
+    if start_line is None:
+        return source
+    return f"{source} lines={start_line}-{metadata.get('end_line')}"
 
 
 class RetrievalPipeline:
@@ -18,27 +133,27 @@ class RetrievalPipeline:
     Args:
         chunker: Chunking strategy to use. If None, uses config default.
         source_dir: Optional source directory name to include in collection name.
+        embeddings: Embedding model to use. If None, uses the shared cached model.
+        collection_name: Existing collection to attach to. If None, the name is
+            derived from source_dir, the chunker and the LLM model.
     """
     
-    def __init__(self, chunker: BaseChunker | None = None, source_dir: str | None = None):
+    def __init__(
+        self,
+        chunker: BaseChunker | None = None,
+        source_dir: str | None = None,
+        embeddings: Embeddings | None = None,
+        collection_name: str | None = None,
+    ):
         self.chunker = chunker or get_chunker(settings.CHUNKING_STRATEGY)
         
-        # Initialize embeddings
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name=settings.EMBEDDING_MODEL
-        )
+        # Initialize embeddings, persisting chunk vectors across re-indexes
+        self.embeddings = embeddings or get_shared_embeddings()
         
         # Create a safe collection name based on source dir, strategy and model
-        model_slug = settings.LLM_MODEL.split("/")[-1].replace("-", "_").replace(".", "_")
-        if source_dir:
-            # Sanitize source_dir: replace non-alphanumeric with underscore
-            safe_source = "".join(c if c.isalnum() else "_" for c in source_dir)
-            collection_name = f"{safe_source}_{self.chunker.name}_{model_slug}"
-        else:
-            collection_name = f"{self.chunker.name}_{model_slug}"
-        
-        if len(collection_name) > 48:
-            collection_name = collection_name[:48]
+        if collection_name is None:
+            collection_name = build_collection_name(self.chunker.name, source_dir)
+        self.collection_name = collection_name
         
         # Initialize vector store
         self.vector_store = AstraDBVectorStore(
@@ -54,39 +169,217 @@ class RetrievalPipeline:
             from src.retrieval.graph_store import CodeKnowledgeGraph
             self.graph_store = CodeKnowledgeGraph(db_path=settings.KUZU_DB_DIR)
         
+        # Serializes graph writes when chunk batches are indexed concurrently
+        self._graph_lock = asyncio.Lock()
+        
+        # Retrieval tools already built for this pipeline, keyed by k
+        self._retrieval_tools: dict[int, object] = {}
+        
         # Track indexed documents
         self.document_ids: list[str] = []
+        
+        # (source, content_hash) of files known to be in the vector store
+        self._indexed_files: set[tuple[str, str]] = set()
     
     def index_documents(self, documents: list[Document]) -> list[str]:
         """
         Chunk and index documents into the vector store.
         
+        Runs `aindex_documents` on a fresh event loop, so it must not be
+        called from inside a running loop (await `aindex_documents` there).
+        
         Args:
             documents: Raw documents to process
             
         Returns:
             List of document IDs
         """
-        # Split documents using chunker
-        chunks = self.chunker.split(documents)
-        print(f"Split into {len(chunks)} chunks using {self.chunker.name} strategy")
+        return asyncio.run(self.aindex_documents(documents))
+    
+    async def aindex_documents(self, documents: list[Document]) -> list[str]:
+        """
+        Chunk and index documents, upserting chunk batches concurrently.
         
-        # Build Neo4j knowledge graph if in graph mode
-        if self.graph_store and self.chunker.name == "graph":
-            self.graph_store.add_entities(chunks)
-            print("Built Kùzu Code Knowledge Graph")
+        Chunks are split into batches of ``settings.EMBED_BATCH_SIZE`` and up
+        to ``settings.EMBED_CONCURRENCY`` batches are embedded and upserted
+        at once.
+        
+        Args:
+            documents: Raw documents to process
+            
+        Returns:
+            List of document IDs
+        """
+        # Split new or changed documents using chunker
+        documents = await self.afilter_unindexed(documents)
+        chunks = await asyncio.to_thread(self.chunk, documents)
+        logger.info("Split into %d chunks using %s strategy", len(chunks), self.chunker.name)
+        
+        # Build Kùzu knowledge graph if in graph mode
+        if await self._aadd_to_graph(chunks):
+            logger.info("Built Kùzu Code Knowledge Graph")
         
-        # Add to vector store
-        self.document_ids = self.vector_store.add_documents(documents=chunks)
-        print(f"Indexed {len(self.document_ids)} documents")
+        # Upsert into vector store under content-derived IDs
+        chunks, ids = _with_stable_ids(chunks)
+        size = settings.EMBED_BATCH_SIZE
+        semaphore = asyncio.Semaphore(settings.EMBED_CONCURRENCY)
+        
+        async def upsert(start: int) -> list[str]:
+            async with semaphore:
+                return await self.vector_store.aadd_documents(
+                    documents=chunks[start:start + size], ids=ids[start:start + size]
+                )
+        
+        batches = await asyncio.gather(*(upsert(start) for start in range(0, len(chunks), size)))
+        self.document_ids = [doc_id for batch in batches for doc_id in batch]
+        await self.amark_indexed(chunks)
+        logger.info("Indexed %d documents", len(self.document_ids))
         
         return self.document_ids
+
+    async def aindex_chunks(self, chunks: list[Document]) -> list[str]:
+        """
+        Index already-chunked documents without blocking the event loop.
+        
+        The files they came from are not marked indexed; call `amark_indexed`
+        once every chunk of a file has been indexed.
+        
+        Args:
+            chunks: Documents produced by this pipeline's chunker
             
-    def create_retrieval_tool(self):
-        """Create a LangChain tool for retrieval."""
+        Returns:
+            List of document IDs
+        """
+        await self._aadd_to_graph(chunks)
+        
+        chunks, ids = _with_stable_ids(chunks)
+        ids = await self.vector_store.aadd_documents(documents=chunks, ids=ids)
+        self.document_ids.extend(ids)
+        return ids
+    
+    async def _aadd_to_graph(self, chunks: list[Document]) -> bool:
+        """
+        Add the named entities among chunks to the Kùzu graph, in graph mode.
+        
+        Returns whether any were added; with none, the graph is not touched.
+        """
+        if not (self.graph_store and self.chunker.name == "graph"):
+            return False
+        entities = [chunk for chunk in chunks if chunk.metadata.get("name")]
+        if not entities:
+            return False
+        async with self._graph_lock:
+            await asyncio.to_thread(self.graph_store.add_entities, entities)
+        return True
+    
+    def chunk(self, documents: list[Document]) -> list[Document]:
+        """
+        Split documents with this pipeline's chunker.
+        
+        Each chunk is tagged with the content_hash of the file it came from,
+        so later runs can tell the file is already indexed.
+        """
+        chunks = self.chunker.split(documents)
+        hashes = {
+            doc.metadata.get("source", ""): doc.metadata["content_hash"]
+            for doc in documents if "content_hash" in doc.metadata
+        }
+        if hashes:
+            for chunk in chunks:
+                content_hash = hashes.get(chunk.metadata.get("source", ""))
+                if content_hash:
+                    chunk.metadata["content_hash"] = content_hash
+        return chunks
+    
+    def is_indexed(self, document: Document) -> bool:
+        """
+        Whether this file, with this exact content, is already in the vector store.
+        
+        Checks files seen by this process first, then asks the store for the
+        chunk `amark_indexed` stamped with this source and content_hash.
+        """
+        key = _index_key(document.metadata)
+        if key is None:
+            return False
+        if key in self._indexed_files:
+            return True
+        if self.vector_store.metadata_search(filter=_index_filter(key), n=1):
+            self._indexed_files.add(key)
+            return True
+        return False
+    
+    async def ais_indexed(self, document: Document) -> bool:
+        """Async version of `is_indexed`."""
+        return not await self.afilter_unindexed([document])
+    
+    async def afilter_unindexed(self, documents: list[Document]) -> list[Document]:
+        """
+        Drop documents that are already indexed.
+        
+        Files not seen by this process are looked up in groups of
+        ``settings.INDEX_CHECK_BATCH_SIZE``, one ``$in`` query per group and
+        at most ``settings.EMBED_CONCURRENCY`` queries at once.
+        """
+        unknown = sorted({
+            key for key in map(_index_key, (doc.metadata for doc in documents))
+            if key and key not in self._indexed_files
+        })
+        size = settings.INDEX_CHECK_BATCH_SIZE
+        semaphore = asyncio.Semaphore(settings.EMBED_CONCURRENCY)
+        
+        async def check(group: list[tuple[str, str]]) -> None:
+            async with semaphore:
+                found = await self.vector_store.ametadata_search(
+                    filter={
+                        "source": {"$in": [source for source, _ in group]},
+                        INDEXED_FIELD: {"$in": [content_hash for _, content_hash in group]},
+                    },
+                    n=len(group),
+                )
+            keys = {(doc.metadata.get("source", ""), doc.metadata.get(INDEXED_FIELD)) for doc in found}
+            self._indexed_files.update(keys.intersection(group))
+        
+        await asyncio.gather(*(check(unknown[i:i + size]) for i in range(0, len(unknown), size)))
+        return [doc for doc in documents if _index_key(doc.metadata) not in self._indexed_files]
+    
+    async def amark_indexed(self, chunks: list[Document]) -> None:
+        """
+        Record that the files these chunks came from are fully indexed.
+        
+        Call only after every chunk of those files has been upserted. The
+        first chunk of each file is stamped with its content_hash, which is
+        what `ais_indexed` looks for, so a file whose upsert failed part-way
+        is indexed again on the next run.
+        """
+        firsts: dict[tuple[str, str], str] = {}
+        for chunk, chunk_id in zip(*_with_stable_ids(chunks)):
+            key = _index_key(chunk.metadata)
+            if key and key not in self._indexed_files:
+                firsts.setdefault(key, chunk_id)
+        if not firsts:
+            return
+        await self.vector_store.aupdate_metadata(
+            {chunk_id: {INDEXED_FIELD: key[1]} for key, chunk_id in firsts.items()}
+        )
+        self._indexed_files.update(firsts)
+            
+    def get_retrieval_tool(self, k: int | None = None):
+        """Return the retrieval tool for `k`, creating it on first use."""
+        k = k or settings.RETRIEVAL_K
+        if k not in self._retrieval_tools:
+            self._retrieval_tools[k] = self.create_retrieval_tool(k=k)
+        return self._retrieval_tools[k]
+    
+    def create_retrieval_tool(self, k: int | None = None):
+        """
+        Create a LangChain tool for retrieval.
+        
+        Args:
+            k: Number of documents the tool retrieves (defaults to config)
+        """
         vector_store = self.vector_store
         graph_store = self.graph_store
-        k = settings.RETRIEVAL_K
+        k = k or settings.RETRIEVAL_K
         chunker_name = self.chunker.name
         use_graph = chunker_name == "graph" and graph_store is not None
         pipeline_ref = self
@@ -113,7 +406,7 @@ class RetrievalPipeline:
                 retrieved_docs = vector_store.similarity_search(query, k=k)
             
             serialized = "\n\n".join(
-                f"Source: {doc.metadata}\nContent: {doc.page_content}"
+                f"Source: {_source_line(doc.metadata)}\nContent: {doc.page_content}"
                 for doc in retrieved_docs
             )
             return serialized, retrieved_docs
@@ -150,14 +443,26 @@ class RetrievalPipeline:
     def search_with_context(self, query: str, k: int = 2) -> list[Document]:
         """Search with adjacent chunk expansion for P3."""
         results = self.vector_store.similarity_search(query, k=k)
+        adjacent_ids = [
+            [
+                adj_id
+                for adj_id in (doc.metadata.get("prev_chunk_id"), doc.metadata.get("next_chunk_id"))
+                if adj_id
+            ]
+            for doc in results
+        ]
+        
+        # Fetch all prev/next chunks in one metadata query, without embedding
+        wanted = list(dict.fromkeys(adj_id for ids in adjacent_ids for adj_id in ids))
+        by_id: dict[str, Document] = {}
+        if wanted:
+            for adj_doc in self.vector_store.metadata_search(
+                filter={"chunk_id": {"$in": wanted}}, n=len(wanted)
+            ):
+                by_id.setdefault(adj_doc.metadata.get("chunk_id"), adj_doc)
+        
         expanded = []
-        for doc in results:
+        for doc, ids in zip(results, adjacent_ids):
             expanded.append(doc)
-            # Fetch prev/next chunks by ID
-            for adj_id in [doc.metadata.get("prev_chunk_id"), doc.metadata.get("next_chunk_id")]:
-                if adj_id:
-                    adj_docs = self.vector_store.similarity_search(
-                        "", k=1, filter={"chunk_id": adj_id}
-                    )
-                    expanded.extend(adj_docs)
+            expanded.extend(by_id[adj_id] for adj_id in ids if adj_id in by_id)
         return expanded
\ No newline at end of file
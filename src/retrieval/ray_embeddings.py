@@ -0,0 +1,49 @@
+"""Distributed chunk embedding with Ray Data for large uploads.
+
+Ray is an optional dependency; it is only imported when this path is used.
+"""
+
+from src.config import settings
+
+
+class _Embedder:
+    """Ray actor that loads the configured embedding model once and embeds batches."""
+
+    def __init__(self):
+        from src.retrieval.pipeline import build_embeddings
+
+        self.model, _ = build_embeddings()
+
+    def __call__(self, batch: dict) -> dict:
+        batch["embedding"] = self.model.embed_documents(list(batch["text"]))
+        return batch
+
+
+def embed_with_ray(texts: list[str]) -> list[list[float]]:
+    """
+    Embed texts across a pool of Ray actors.
+
+    Args:
+        texts: Chunk texts to embed
+
+    Returns:
+        Embeddings in the same order as `texts`
+    """
+    import ray
+
+    if not ray.is_initialized():
+        ray.init(ignore_reinit_error=True)
+
+    ds = ray.data.from_items([{"idx": i, "text": text} for i, text in enumerate(texts)])
+    ds = ds.map_batches(
+        _Embedder,
+        batch_size=settings.EMBED_BATCH_SIZE,
+        num_gpus=settings.RAY_GPUS_PER_WORKER,
+        concurrency=settings.RAY_EMBED_WORKERS,
+    )
+
+    vectors: list[list[float] | None] = [None] * len(texts)
+    for batch in ds.iter_batches(batch_size=settings.EMBED_BATCH_SIZE):
+        for idx, vector in zip(batch["idx"], batch["embedding"]):
+            vectors[int(idx)] = list(vector)
+    return vectors
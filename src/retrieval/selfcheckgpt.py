@@ -1,8 +1,13 @@
-import torch
-import torch.nn.functional as F
-from langchain_huggingface import HuggingFaceEmbeddings
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import sys
+import threading
 
-from src.agents.rag_agent import create_rag_agent, run_agent
+import numpy as np
+
+from src.agents.rag_agent import arun_agent_batch, create_rag_agent, run_agent_batch
 from src.api.models import ChunkingStrategy
 from src.chunking import get_chunker
 from src.chunking.base import BaseChunker
@@ -10,13 +15,78 @@ from src.config import settings
 from src.retrieval.pipeline import RetrievalPipeline
 
 
+# Sampled responses and response embeddings kept across SelfCheckGPT instances
+SAMPLE_CACHE_SIZE = 1024
+VECTOR_CACHE_SIZE = 4096
+
+# Character 3-gram Jaccard at which a sample counts as the same response
+NEAR_IDENTICAL_JACCARD = 0.98
+
+# Embeds responses off the calling thread, e.g. while the sampling agent runs
+_embed_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="selfcheck-embed")
+
+
+def _quantize(vectors: np.ndarray) -> np.ndarray:
+    """
+    Symmetric int8 quantization of each vector (row).
+
+    Cosine similarity is scale-invariant, so the per-row scales are dropped;
+    the error this adds to a 768-dim cosine is well under 0.01.
+    """
+    peak = np.maximum(np.abs(vectors).max(axis=-1, keepdims=True), 1e-6)
+    return np.round(vectors * (127 / peak)).astype(np.int8)
+
+
+def _near_identical(a: str, b: str) -> bool:
+    """Whether two responses are equal or nearly so, by character 3-grams."""
+    if a == b:
+        return True
+    grams_a = {a[i:i + 3] for i in range(len(a) - 2)}
+    grams_b = {b[i:i + 3] for i in range(len(b) - 2)}
+    union = len(grams_a | grams_b)
+    return union > 0 and len(grams_a & grams_b) / union >= NEAR_IDENTICAL_JACCARD
+
+
+def _differing(sampled_responses: list[str], inital_response: str) -> list[str]:
+    """Samples that do not repeat the response; the rest score 1 unembedded."""
+    return [
+        sample for sample in sampled_responses
+        if not _near_identical(sample, inital_response)
+    ]
+
+
+def _score(samples: np.ndarray, b: np.ndarray, num_samples: int) -> tuple[float, bool]:
+    """
+    Mean similarity over all samples, from the int8 vectors of the differing
+    ones and of the response; near-identical samples count as 1.
+    """
+    # Exact integer dot products of the int8 vectors
+    dots = samples.astype(np.int32) @ b.astype(np.int32)
+    similarities = dots / (np.linalg.norm(samples, axis=1) * np.linalg.norm(b) + 1e-12)
+    identical = num_samples - len(samples)
+    similarity = float((similarities.sum() + identical) / num_samples)
+
+    hallucinating = similarity <= 0.5
+    return similarity, hallucinating
+
+
 class SelfCheckGPT:
+    _sample_cache: OrderedDict[str, list[str]] = OrderedDict()
+    _vector_cache: OrderedDict[tuple[int, str], np.ndarray] = OrderedDict()  # int8 rows
+    _sample_lock = threading.Lock()
+    # Sampling agents keyed by (collection, k, temperature, system prompt)
+    _agents: dict[tuple, object] = {}
+    # Pipelines built for callers that pass none, keyed by chunker name
+    _pipelines: dict[str, RetrievalPipeline] = {}
+
     def __init__(
         self,
         chunker: BaseChunker | None = None,
         temp_reducing_factor: float = 0.2,
         k: int = 3,
         system_prompt: str | None = None,
+        pipeline: RetrievalPipeline | None = None,
+        num_samples: int = 3,
     ):
         """
         Initialize the SelfCheckGPT retrieval system.
@@ -28,6 +98,11 @@ class SelfCheckGPT:
                 Defaults to 0.2.
             k (int, optional): number of relevent docs to include
             system_prompt (str, optional): System prompt for the agent
+            pipeline (RetrievalPipeline | None, optional): Pipeline to sample responses
+                from. Its embedding model is reused. If None, a pipeline shared by all
+                instances with the same chunker is used.
+            num_samples (int, optional): Responses sampled per check; their similarities
+                to the checked response are averaged. Defaults to 3.
         Raises:
             ValueError: If the embedding model specified in settings is unavailable.
         """
@@ -35,47 +110,261 @@ class SelfCheckGPT:
         self.chunker = chunker or get_chunker(settings.CHUNKING_STRATEGY)
         self.temp = min (1, settings.LLM_TEMPERATURE + temp_reducing_factor)
         self.k = k
-        self.embeddings = HuggingFaceEmbeddings(model_name=settings.EMBEDDING_MODEL)
+        self.pipeline = pipeline or self._default_pipeline(self.chunker)
+        # Responses are one-off texts: embed them with the model itself rather
+        # than through the pipeline's on-disk chunk cache
+        self.embeddings = getattr(self.pipeline.embeddings, "underlying", self.pipeline.embeddings)
+        # With the HuggingFace backend, call its SentenceTransformer directly
+        sentence_transformers = sys.modules.get("sentence_transformers")
+        client = getattr(self.embeddings, "_client", None)
+        self._encoder = client if sentence_transformers is not None and isinstance(
+            client, sentence_transformers.SentenceTransformer
+        ) else None
         self.system_prompt = system_prompt
+        self.num_samples = num_samples
+
+    @classmethod
+    def clear_sample_cache(cls) -> None:
+        """Drop cached sampled responses, e.g. after a collection is re-indexed."""
+        with cls._sample_lock:
+            cls._sample_cache.clear()
 
-    def is_hallucinating(self, query: str, inital_response: str) -> tuple[float, bool]:
+    @classmethod
+    def _default_pipeline(cls, chunker: BaseChunker) -> RetrievalPipeline:
+        """Return the shared pipeline for the chunker's default collection."""
+        pipeline = cls._pipelines.get(chunker.name)
+        if pipeline is None:
+            pipeline = RetrievalPipeline(chunker=chunker)
+            with cls._sample_lock:
+                pipeline = cls._pipelines.setdefault(chunker.name, pipeline)
+        return pipeline
+
+    def is_hallucinating(
+        self,
+        query: str,
+        inital_response: str,
+        initial_embedding: np.ndarray | list[float] | None = None,
+    ) -> tuple[float, bool]:
         """
-        Check if a response contains hallucinations by comparing it with a sampled response.
+        Check if a response contains hallucinations by comparing it with sampled responses.
 
-        Uses the SelfCheckGPT approach: generates a new response to the same query and
-        computes cosine similarity between embeddings. If similarity is below threshold,
-        the initial response is likely hallucinating.
+        Uses the SelfCheckGPT approach: generates num_samples new responses to the same
+        query and averages their embedding cosine similarity to the initial response.
+        If the mean similarity is below threshold, the initial response is likely
+        hallucinating.
 
         Args:
             query: The original user query.
             inital_response: The initial response to be checked for hallucinations.
+            initial_embedding: Embedding of inital_response, if the caller already has
+                one from the same model; it is then not embedded again.
 
         Returns:
             tuple: A tuple containing:
-                - similarity (float): Cosine similarity score between the sampled and initial responses.
+                - similarity (float): Mean cosine similarity between the sampled and initial responses.
                 - hallucinating (bool): True if hallucination detected (similarity <= 0.5), False otherwise.
         """
-        original_k = settings.RETRIEVAL_K
-        settings.RETRIEVAL_K = self.k
+        if initial_embedding is None:
+            # The initial response is known up front; embed it during sampling
+            inital_future = _embed_pool.submit(self._embed, [inital_response])
+        sampled_responses = self._sample(query)
+
+        different = _differing(sampled_responses, inital_response)
+        if not different:
+            return 1.0, False
+
+        samples = self._embed(different)
+        if initial_embedding is None:
+            b = inital_future.result()[0]
+        else:
+            b = _quantize(np.asarray(initial_embedding, dtype=np.float32))
+        return _score(samples, b, len(sampled_responses))
+
+    async def ais_hallucinating(
+        self,
+        query: str,
+        inital_response: str,
+        initial_embedding: np.ndarray | list[float] | None = None,
+    ) -> tuple[float, bool]:
+        """
+        Async `is_hallucinating`, for use from an event loop.
+
+        The agent runs are awaited and embedding runs on worker threads, so
+        the loop stays free while the check waits on the LLM.
+        """
+        loop = asyncio.get_running_loop()
+        if initial_embedding is None:
+            # The initial response is known up front; embed it during sampling
+            inital_future = loop.run_in_executor(_embed_pool, self._embed, [inital_response])
+        sampled_responses = await self._asample(query)
 
-        pipeline = RetrievalPipeline(chunker=self.chunker)
-        retrieval_tool = pipeline.create_retrieval_tool()
+        different = _differing(sampled_responses, inital_response)
+        if not different:
+            return 1.0, False
+
+        samples = await loop.run_in_executor(_embed_pool, self._embed, different)
+        if initial_embedding is None:
+            b = (await inital_future)[0]
+        else:
+            b = _quantize(np.asarray(initial_embedding, dtype=np.float32))
+        return _score(samples, b, len(sampled_responses))
+
+    def batch_is_hallucinating(self, pairs: list[tuple[str, str]]) -> list[tuple[float, bool]]:
+        """
+        `is_hallucinating` for many (query, response) pairs at once.
+
+        Repeated pairs and queries are checked once, the samples for all
+        uncached queries come from one concurrent agent batch, and every
+        text still to embed goes through one encode call.
+
+        Args:
+            pairs: (query, response) pairs to check.
+
+        Returns:
+            list: One (similarity, hallucinating) tuple per pair, in order.
+        """
+        unique = list(dict.fromkeys(pairs))
+        samples_by_query = self._sample_many(list(dict.fromkeys(query for query, _ in unique)))
+
+        differing = {
+            pair: _differing(samples_by_query[pair[0]], pair[1]) for pair in unique
+        }
+        texts = list(dict.fromkeys(
+            text
+            for (_, response), different in differing.items() if different
+            for text in (response, *different)
+        ))
+        rows = {text: i for i, text in enumerate(texts)}
+        vectors = self._embed(texts) if texts else None
+
+        scores = {}
+        for pair, different in differing.items():
+            if not different:
+                scores[pair] = (1.0, False)
+                continue
+            samples = vectors[[rows[sample] for sample in different]]
+            scores[pair] = _score(samples, vectors[rows[pair[1]]], self.num_samples)
+        return [scores[pair] for pair in pairs]
+
+    def _embed(self, texts: list[str]) -> np.ndarray:
+        """
+        Embed response texts as int8 rows, reusing recently seen vectors.
+
+        Cached samples come back for repeated checks of a query, so their
+        vectors are usually cached too. Misses are embedded in one batch.
+        """
+        keys = [
+            (id(self.embeddings), hashlib.sha256(text.encode("utf-8")).hexdigest())
+            for text in texts
+        ]
+        vectors = []
+        with self._sample_lock:
+            for key in keys:
+                vector = self._vector_cache.get(key)
+                if vector is not None:
+                    self._vector_cache.move_to_end(key)
+                vectors.append(vector)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            fresh = _quantize(self._encode([texts[i] for i in missing]))
+            with self._sample_lock:
+                for i, vector in zip(missing, fresh):
+                    vectors[i] = self._vector_cache[keys[i]] = vector
+                while len(self._vector_cache) > VECTOR_CACHE_SIZE:
+                    self._vector_cache.popitem(last=False)
+        return np.stack(vectors)
+
+    def _encode(self, texts: list[str]) -> np.ndarray:
+        """
+        Embed texts as a float32 array.
+
+        A SentenceTransformer is called directly, in one batch with normalized
+        output, skipping the LangChain wrapper's per-call list conversion.
+        """
+        if self._encoder is not None:
+            return self._encoder.encode(
+                texts,
+                batch_size=len(texts),
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                show_progress_bar=False,
+            )
+        return np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32)
+
+    def _sample(self, query: str) -> list[str]:
+        """
+        Sample fresh responses to `query`, reusing ones cached for this setup.
+
+        The samples only depend on the query, collection, k, temperature,
+        system prompt and sample count, so repeated checks of a query skip
+        the agent runs.
+        """
+        return self._sample_many([query])[query]
+
+    def _sample_many(self, queries: list[str]) -> dict[str, list[str]]:
+        """
+        `_sample` for several distinct queries, with every uncached query's
+        samples generated in one concurrent agent batch.
+        """
+        samples_by_query = {}
+        missing = []
+        for query in queries:
+            sampled_responses = self._cached_samples(self._sample_key(query))
+            if sampled_responses is None:
+                missing.append(query)
+            else:
+                samples_by_query[query] = sampled_responses
 
-        agent = create_rag_agent(
-            tools=[retrieval_tool], temp=self.temp, system_prompt=self.system_prompt
-        )
+        if missing:
+            n = self.num_samples
+            responses = run_agent_batch(
+                self._get_agent(), [query for query in missing for _ in range(n)]
+            )
+            for i, query in enumerate(missing):
+                samples_by_query[query] = responses[i * n:(i + 1) * n]
+                self._cache_samples(self._sample_key(query), samples_by_query[query])
+        return samples_by_query
 
-        sampled_response = run_agent(agent, query, stream=False)
+    async def _asample(self, query: str) -> list[str]:
+        """Async `_sample`."""
+        key = self._sample_key(query)
+        sampled_responses = self._cached_samples(key)
+        if sampled_responses is None:
+            sampled_responses = await arun_agent_batch(
+                self._get_agent(), [query] * self.num_samples
+            )
+            self._cache_samples(key, sampled_responses)
+        return sampled_responses
 
-        settings.RETRIEVAL_K = original_k
+    def _sample_key(self, query: str) -> str:
+        raw = "\0".join((
+            self.pipeline.collection_name, str(self.k), str(self.temp),
+            self.system_prompt or "", str(self.num_samples), query,
+        ))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
 
-        sample_embed, inital_embed = self.embeddings.embed_documents(
-            [sampled_response, inital_response]
-        )
+    def _cached_samples(self, key: str) -> list[str] | None:
+        with self._sample_lock:
+            sampled_responses = self._sample_cache.get(key)
+            if sampled_responses is not None:
+                self._sample_cache.move_to_end(key)
+            return sampled_responses
 
-        sample_tensor = torch.tensor(sample_embed).unsqueeze(0)
-        inital_tensor = torch.tensor(inital_embed).unsqueeze(0)
-        similarity = F.cosine_similarity(sample_tensor, inital_tensor).item()
+    def _cache_samples(self, key: str, sampled_responses: list[str]) -> None:
+        with self._sample_lock:
+            self._sample_cache[key] = sampled_responses
+            while len(self._sample_cache) > SAMPLE_CACHE_SIZE:
+                self._sample_cache.popitem(last=False)
 
-        hallucinating = similarity <= 0.5
-        return similarity, hallucinating
+    def _get_agent(self):
+        """Return the sampling agent for this setup, building it on first use."""
+        key = (self.pipeline.collection_name, self.k, self.temp, self.system_prompt)
+        agent = self._agents.get(key)
+        if agent is None:
+            retrieval_tool = self.pipeline.get_retrieval_tool(k=self.k)
+            agent = create_rag_agent(
+                tools=[retrieval_tool], temp=self.temp, system_prompt=self.system_prompt
+            )
+            with self._sample_lock:
+                agent = self._agents.setdefault(key, agent)
+        return agent
@@ -1,54 +1,77 @@
+import asyncio
 import subprocess
 import os
+import shutil
 import sys
 import signal
 
-def run_dev():
-    """Run both backend and frontend concurrently."""
-    print("Starting RAG Pipeline Development Servers...")
 
-    # Start Backend
-    backend_process = subprocess.Popen(
-        ["uv", "run", "uvicorn", "src.api.main:app", "--reload"],
+async def _start(argv, **kwargs):
+    """Start argv in its own process group with stdout and stderr piped together."""
+    if os.name == "nt":
+        kwargs["creationflags"] = subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs["start_new_session"] = True
+    # Without a shell, Windows needs the full name of wrappers like npm.cmd
+    argv = [shutil.which(argv[0]) or argv[0], *argv[1:]]
+    return await asyncio.create_subprocess_exec(
+        *argv,
         stdout=subprocess.PIPE,
         stderr=subprocess.STDOUT,
-        text=True,
-        bufsize=1,
-        universal_newlines=True,
-        shell=True
+        **kwargs
     )
 
-    # Start Frontend
-    frontend_process = subprocess.Popen(
-        ["npm", "run", "dev"],
-        cwd=os.path.join(os.getcwd(), "src", "frontend"),
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        text=True,
-        bufsize=1,
-        universal_newlines=True,
-        shell=True
-    )
 
-    def print_output(process, prefix):
-        for line in iter(process.stdout.readline, ""):
-            print(f"[{prefix}] {line.strip()}")
+def _stop(process):
+    """Stop a process started by _start together with its children."""
+    try:
+        if os.name == "nt":
+            process.send_signal(signal.CTRL_BREAK_EVENT)
+        else:
+            os.killpg(process.pid, signal.SIGTERM)
+    except (ProcessLookupError, OSError):
+        pass  # Already exited
+
+
+async def _print_output(process, prefix):
+    async for line in process.stdout:
+        print(f"[{prefix}] {line.decode(errors='replace').strip()}")
+
 
-    import threading
-    
-    t1 = threading.Thread(target=print_output, args=(backend_process, "BACKEND"))
-    t2 = threading.Thread(target=print_output, args=(frontend_process, "FRONTEND"))
-    
-    t1.start()
-    t2.start()
+async def _run_dev():
+    # Start Backend
+    backend_process = await _start(["uv", "run", "uvicorn", "src.api.main:app", "--reload"])
+    frontend_process = None
 
+    # Servers are stopped however this exits: Ctrl+C, an error or a crash
     try:
-        backend_process.wait()
-        frontend_process.wait()
-    except KeyboardInterrupt:
+        # Start Frontend
+        frontend_process = await _start(
+            ["npm", "run", "dev"],
+            cwd=os.path.join(os.getcwd(), "src", "frontend"),
+        )
+
+        # Both outputs are pumped by this one thread's event loop
+        await asyncio.gather(
+            _print_output(backend_process, "BACKEND"),
+            _print_output(frontend_process, "FRONTEND"),
+            backend_process.wait(),
+            frontend_process.wait(),
+        )
+    finally:
         print("\nShutting down servers...")
-        backend_process.terminate()
-        frontend_process.terminate()
+        _stop(backend_process)
+        if frontend_process is not None:
+            _stop(frontend_process)
+
+
+def run_dev():
+    """Run both backend and frontend concurrently."""
+    print("Starting RAG Pipeline Development Servers...")
+
+    try:
+        asyncio.run(_run_dev())
+    except KeyboardInterrupt:
         sys.exit(0)
 
 if __name__ == "__main__":